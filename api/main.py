@@ -10,7 +10,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
 from api.routes import parse, health
+from api.services.circuit_breaker import CircuitBreaker
+from api.services.job_queue import open_job_queue
+from api.services.job_scheduler import JobScheduler
 from api.services.ozon_parser import OzonParserService
+from api.services.result_cache import ResultCache
+from api.services.sheets_client import close_sheets_clients
+from api.services.task_events import TaskEventHub
+from api.services.task_store import SqliteTaskStore
 
 
 @asynccontextmanager
@@ -19,15 +26,55 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Ozon Parser API...")
 
     # Initialize parser service
-    app.state.parser = OzonParserService()
+    app.state.parser = OzonParserService(
+        headless=os.environ.get("PARSER_HEADLESS", "true").lower() == "true",
+        delay=float(os.environ.get("PARSER_DELAY", "2.5")),
+        pool_size=int(os.environ.get("PARSER_POOL_SIZE", "2")),
+        resource_profile=os.environ.get("PARSER_RESOURCE_PROFILE", "jsonld-only"),
+        ready_timeout=float(os.environ.get("PARSER_READY_TIMEOUT", "10")),
+        http_first=os.environ.get("PARSER_HTTP_FIRST", "true").lower() == "true",
+        cache=ResultCache(
+            ttl=float(os.environ.get("PARSER_CACHE_TTL", "600")),
+            max_size=int(os.environ.get("PARSER_CACHE_SIZE", "5000")),
+            db_path=os.environ.get("PARSER_CACHE_DB") or None
+        ),
+        context_recycle_after=int(os.environ.get("PARSER_RECYCLE_CONTEXT_AFTER", "50")),
+        browser_recycle_after=int(os.environ.get("PARSER_RECYCLE_BROWSER_AFTER", "500")),
+        max_browser_rss_mb=float(os.environ.get("PARSER_MAX_BROWSER_RSS_MB", "700")),
+        # Set JOB_QUEUE_URL to hand SKUs to ozon_parser/queue_worker.py processes
+        job_queue=open_job_queue(os.environ["JOB_QUEUE_URL"]) if os.environ.get("JOB_QUEUE_URL") else None,
+        queue_timeout=float(os.environ.get("JOB_QUEUE_TIMEOUT", "300")),
+        circuit_breaker=CircuitBreaker(
+            window=int(os.environ.get("CIRCUIT_WINDOW", "20")),
+            threshold=float(os.environ.get("CIRCUIT_BLOCK_RATE", "0.5")),
+            cooldown=float(os.environ.get("CIRCUIT_COOLDOWN", "120"))
+        )
+    )
     await app.state.parser.start()
     logger.info("Parser service initialized")
 
+    # Durable task store; unfinished tasks continue where they stopped
+    app.state.task_store = SqliteTaskStore(os.environ.get("TASK_STORE_PATH", "data/tasks.db"))
+    app.state.task_events = TaskEventHub()
+
+    # Parse jobs: capped concurrency, one parser slot per browser context
+    app.state.scheduler = JobScheduler(
+        max_jobs=int(os.environ.get("PARSER_MAX_JOBS", "2")),
+        slots=app.state.parser.pool.size
+    )
+    parse.resume_unfinished_tasks(
+        app.state.parser, app.state.task_store, app.state.task_events, app.state.scheduler
+    )
+
     yield
 
     # Cleanup
     logger.info("Shutting down...")
+    # Cancelled jobs write out their buffered rows and stay resumable
+    await app.state.scheduler.close()
     await app.state.parser.close()
+    app.state.task_store.close()
+    close_sheets_clients()
 
 
 app = FastAPI(
@@ -1,17 +1,20 @@
 """Health check endpoint"""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from datetime import datetime
 
 router = APIRouter()
 
 
 @router.get("/health")
-async def health_check():
-    """Health check for Northflank"""
+async def health_check(req: Request):
+    """Health check for Northflank (stays 200 while the circuit is open)"""
+    parser = getattr(req.app.state, "parser", None)
     return {
         "status": "ok",
         "service": "ozon-parser-api",
         "version": "1.0.0",
+        "browser": parser.browser_state() if parser else None,
+        "circuit": parser.breaker.stats() if parser else None,
         "timestamp": datetime.utcnow().isoformat()
     }
@@ -1,19 +1,30 @@
 """Parse endpoints for Ozon competitor prices"""
 
+import os
+import json
 import uuid
+import hashlib
 import asyncio
-from typing import Optional, List
-from datetime import datetime
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from loguru import logger
 
-from api.services.sheets_client import GoogleSheetsClient
+from api.services.job_scheduler import BULK, INTERACTIVE, JobScheduler
+from api.services.sheets_client import SheetWriteBuffer, get_async_sheets_client
+from api.services.task_events import TaskEventHub, ThroughputMeter
 
 router = APIRouter()
 
-# In-memory task storage (for MVP, use Redis in production)
-tasks = {}
+# Sheet write-back is buffered: one write per SHEETS_FLUSH_ROWS results
+# or SHEETS_FLUSH_SECONDS, whichever comes first
+SHEETS_FLUSH_ROWS = int(os.environ.get("SHEETS_FLUSH_ROWS", "20"))
+SHEETS_FLUSH_SECONDS = float(os.environ.get("SHEETS_FLUSH_SECONDS", "15"))
+
+# Comment line sent on idle streams so proxies don't close them
+STREAM_KEEPALIVE = 15.0
 
 
 class ParseRequest(BaseModel):
@@ -22,6 +33,19 @@ class ParseRequest(BaseModel):
     sheet_name: str = "Парсинг товаров"
     column_sku: str = "A"
     start_row: int = 2
+    # Skip SKUs parsed (column H, without error) less than this many hours ago; 0 = parse all
+    max_age_hours: float = 0
+    # Share of parser slots relative to other spreadsheets running at the same time
+    weight: float = 1.0
+    # Repeated requests with the same key get the pending/running task back.
+    # Default: derived from spreadsheet_id/sheet_name/start_row
+    idempotency_key: Optional[str] = None
+
+    def effective_idempotency_key(self) -> str:
+        if self.idempotency_key:
+            return self.idempotency_key
+        source = f"{self.spreadsheet_id}/{self.sheet_name}/{self.start_row}"
+        return "sheet:" + hashlib.sha1(source.encode()).hexdigest()[:16]
 
 
 class ParseResponse(BaseModel):
@@ -34,7 +58,7 @@ class ParseResponse(BaseModel):
 class TaskStatus(BaseModel):
     """Task status response"""
     task_id: str
-    status: str  # pending, running, completed, failed
+    status: str  # pending, running, completed, failed, cancelled
     progress: str
     total: int
     processed: int
@@ -46,136 +70,392 @@ class TaskStatus(BaseModel):
 @router.post("/parse", response_model=ParseResponse)
 async def start_parsing(
     request: ParseRequest,
-    background_tasks: BackgroundTasks,
-    req: Request
+    req: Request,
+    idempotency_key: Optional[str] = Header(default=None)
 ):
     """
     Start parsing Ozon products from Google Sheets.
 
     Reads SKUs from column A, parses Ozon, writes results to columns B-H.
+    A request matching a pending or running task (same Idempotency-Key
+    header / idempotency_key, or the same sheet and start row) returns
+    that task instead of starting another one.
     """
+    store = req.app.state.task_store
+    if idempotency_key:
+        request.idempotency_key = idempotency_key
+    key = request.effective_idempotency_key()
+
+    existing = store.find_unfinished(key)
+    if existing and req.app.state.scheduler.state(existing["task_id"]) is None:
+        # Unfinished in the store but no longer scheduled: the task died, start over
+        logger.warning(f"Task {existing['task_id']} is {existing['status']} but not scheduled, marking failed")
+        store.update(existing["task_id"], status="failed", progress="Task lost",
+                     completed_at=datetime.utcnow().isoformat())
+        existing = None
+    if existing:
+        logger.info(f"Duplicate parse request for {request.spreadsheet_id}, returning task {existing['task_id']}")
+        return ParseResponse(
+            task_id=existing["task_id"],
+            status=existing["status"],
+            message=f"Task already {existing['status']} ({existing['progress']}). "
+                    f"Check status at /api/parse/status/{existing['task_id']}"
+        )
+
     task_id = str(uuid.uuid4())[:8]
 
-    tasks[task_id] = {
-        "status": "pending",
-        "progress": "0/0",
-        "total": 0,
-        "processed": 0,
-        "errors": 0,
-        "started_at": datetime.utcnow().isoformat(),
-        "completed_at": None
-    }
+    # Durable task record: survives restarts and is resumed on startup
+    task = store.create(
+        task_id,
+        request.spreadsheet_id,
+        request.sheet_name,
+        request.column_sku,
+        request.start_row,
+        request.max_age_hours,
+        key,
+        request.weight
+    )
 
     # Get parser service from app state
     parser = req.app.state.parser
 
-    # Start background task
-    background_tasks.add_task(
-        run_parsing_task,
+    # Queue the job; the scheduler caps concurrent jobs and shares parser
+    # slots fairly between spreadsheets
+    scheduler: JobScheduler = req.app.state.scheduler
+    events = req.app.state.task_events
+    scheduler.submit(
         task_id,
         request.spreadsheet_id,
-        request.sheet_name,
-        request.column_sku,
-        request.start_row,
-        parser
+        lambda: run_parsing_task(task, parser, store, events, scheduler),
+        weight=request.weight
     )
 
-    logger.info(f"Started parsing task {task_id} for sheet {request.spreadsheet_id}")
+    logger.info(f"Queued parsing task {task_id} for sheet {request.spreadsheet_id}")
 
     return ParseResponse(
         task_id=task_id,
         status="started",
-        message=f"Parsing started. Check status at /api/parse/status/{task_id}"
+        message=f"Parsing started. Check status at /api/parse/status/{task_id} "
+                f"or follow /api/parse/stream/{task_id}"
     )
 
 
 @router.get("/parse/status/{task_id}", response_model=TaskStatus)
-async def get_task_status(task_id: str):
+async def get_task_status(task_id: str, req: Request):
     """Get parsing task status"""
-    if task_id not in tasks:
+    task = req.app.state.task_store.get(task_id)
+    if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    task = tasks[task_id]
-    return TaskStatus(
-        task_id=task_id,
-        **task
+    return TaskStatus(**{field: task[field] for field in TaskStatus.model_fields})
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.get("/parse/stream/{task_id}")
+async def stream_task(task_id: str, req: Request):
+    """
+    Server-Sent Events for a parse task.
+
+    - status: current counters, sent once on connect
+    - result: one per parsed SKU (result, rows, totals, rate, ETA)
+    - done: final status; the stream ends after it
+    """
+    store = req.app.state.task_store
+    events: TaskEventHub = req.app.state.task_events
+
+    task = store.get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    # Subscribe before sending the snapshot so no result falls in between
+    queue = events.subscribe(task_id)
+
+    async def generate():
+        try:
+            snapshot = {field: task[field] for field in TaskStatus.model_fields}
+            yield _sse("status", snapshot)
+            if task["status"] not in store.UNFINISHED:
+                yield _sse("done", snapshot)
+                return
+
+            while not await req.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event, data)
+                if event == "done":
+                    return
+        finally:
+            events.unsubscribe(task_id, queue)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
+@router.post("/parse/cancel/{task_id}")
+async def cancel_task(task_id: str, req: Request):
+    """Cancel a queued or running parse task; rows written so far are kept"""
+    store = req.app.state.task_store
+    task = store.get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task["status"] not in store.UNFINISHED:
+        raise HTTPException(status_code=409, detail=f"Task already {task['status']}")
+
+    store.update(task_id, status="cancelled", completed_at=datetime.utcnow().isoformat())
+    state = req.app.state.scheduler.cancel(task_id)
+
+    # A running task publishes "done" itself when it unwinds
+    if state != "running":
+        final = store.get(task_id)
+        req.app.state.task_events.publish(task_id, "done", {field: final[field] for field in TaskStatus.model_fields})
+
+    return {"task_id": task_id, "status": "cancelled", "was": state or task["status"]}
+
+
+@router.get("/parse/jobs")
+async def get_jobs(req: Request):
+    """Scheduler state: running/queued jobs and parser slot usage"""
+    return req.app.state.scheduler.stats()
+
+
 @router.post("/parse/test")
-async def test_parse_single(sku: str, req: Request):
-    """Test parsing a single SKU (for debugging)"""
+async def test_parse_single(sku: str, req: Request, fresh: bool = False):
+    """Test parsing a single SKU (for debugging). fresh=true bypasses the cache"""
     parser = req.app.state.parser
-    result = await parser.parse_product(sku)
+    # Interactive requests take the next free parser slot ahead of sheet jobs
+    async with req.app.state.scheduler.slots.slot("interactive", INTERACTIVE):
+        result = await parser.parse_product(sku, use_cache=not fresh)
     return result
 
 
+@router.get("/parse/cache")
+async def get_cache_stats(req: Request):
+    """Result cache hit/miss counters"""
+    cache = req.app.state.parser.cache
+    if not cache:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@router.get("/parse/queue")
+async def get_queue_stats(req: Request):
+    """Worker job queue (remote mode only)"""
+    queue = req.app.state.parser.job_queue
+    if not queue:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(queue.stats)}
+
+
+@router.get("/parse/sheets")
+async def get_sheets_stats():
+    """Sheets quota scheduler: queue depth, throttle time, retries"""
+    return get_async_sheets_client().scheduler.stats()
+
+
+def _is_fresh(parsed_at: str, error: str, max_age: timedelta, now: datetime) -> bool:
+    """Row was parsed successfully within max_age (naive timestamps are UTC)"""
+    if error or not parsed_at:
+        return False
+    try:
+        parsed = datetime.fromisoformat(parsed_at.replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return now - parsed < max_age
+
+
+def group_sku_rows(
+    entries: List[Tuple[int, str, str, str]],
+    max_age_hours: float = 0
+) -> Tuple[Dict[str, List[int]], int]:
+    """
+    Distinct SKUs (in sheet order) with every row that holds them.
+
+    A SKU is skipped when all its rows are fresher than max_age_hours.
+    Returns (sku -> rows, number of rows skipped as fresh).
+    """
+    groups: Dict[str, List[int]] = {}
+    stale = set()
+    max_age = timedelta(hours=max_age_hours)
+    now = datetime.utcnow()
+
+    for row, sku, parsed_at, error in entries:
+        groups.setdefault(sku, []).append(row)
+        if not max_age_hours or not _is_fresh(parsed_at, error, max_age, now):
+            stale.add(sku)
+
+    skipped = sum(len(rows) for sku, rows in groups.items() if sku not in stale)
+    return {sku: rows for sku, rows in groups.items() if sku in stale}, skipped
+
+
 async def run_parsing_task(
-    task_id: str,
-    spreadsheet_id: str,
-    sheet_name: str,
-    column_sku: str,
-    start_row: int,
-    parser
+    task: Dict,
+    parser,
+    store,
+    events: Optional[TaskEventHub] = None,
+    scheduler: Optional[JobScheduler] = None
 ):
-    """Background task for parsing"""
+    """
+    Background task for parsing.
+
+    Each distinct SKU is parsed once and its result is written to every
+    row holding it; SKUs parsed within the task's max_age_hours are skipped.
+    Rows already recorded in the task store are skipped, so a task that
+    was interrupted by a restart continues from the first unprocessed row.
+    Results are written back in coalesced blocks and a row is recorded only
+    after its block reached the sheet. Progress is published to `events`
+    for /parse/stream subscribers.
+
+    Several SKUs are in flight at once, each waiting for a `scheduler`
+    slot, so concurrent tasks share the slots by their weight.
+    """
+    task_id = task["task_id"]
+    spreadsheet_id = task["spreadsheet_id"]
+    sheet_name = task["sheet_name"]
+    events = events or TaskEventHub()
+    scheduler = scheduler or JobScheduler(slots=parser.pool.size)
+    weight = task.get("weight") or 1.0
+
     try:
-        tasks[task_id]["status"] = "running"
+        store.update(task_id, status="running")
 
-        # Initialize Google Sheets client
-        sheets = GoogleSheetsClient()
+        # Shared Google Sheets client; calls run off the event loop
+        sheets = get_async_sheets_client()
 
-        # Read SKUs from sheet
+        # Read SKUs with their row numbers, parse dates and errors
         logger.info(f"Reading SKUs from {spreadsheet_id}/{sheet_name}")
-        skus = sheets.read_skus(spreadsheet_id, sheet_name, column_sku, start_row)
+        entries = await sheets.read_sku_entries(spreadsheet_id, sheet_name, task["column_sku"], task["start_row"])
 
-        if not skus:
-            tasks[task_id]["status"] = "failed"
-            tasks[task_id]["progress"] = "No SKUs found"
+        if not entries:
+            store.update(task_id, status="failed", progress="No SKUs found")
             return
 
-        total = len(skus)
-        tasks[task_id]["total"] = total
-        logger.info(f"Found {total} SKUs to parse")
-
-        results = []
-        errors = 0
-
-        for i, sku in enumerate(skus, 1):
-            try:
-                # Parse product
-                result = await parser.parse_product(sku)
-                results.append(result)
-
-                if result.get("error"):
+        groups, fresh_rows = group_sku_rows(entries, task["max_age_hours"])
+        if fresh_rows:
+            logger.info(f"Task {task_id}: {fresh_rows} rows parsed within {task['max_age_hours']}h, skipped")
+
+        # Progress is counted in distinct SKUs
+        total = len(groups)
+        done = store.done_rows(task_id)
+        finished = [rows for rows in groups.values() if done.issuperset(rows)]
+        processed = len(finished)
+        # Errors count SKUs, like processed: a failed SKU marks every row it occupies
+        failed = store.error_rows(task_id)
+        errors = len([rows for rows in finished if failed.intersection(rows)])
+        store.update(task_id, total=total, processed=processed, progress=f"{processed}/{total}")
+
+        if processed:
+            logger.info(f"Task {task_id}: resuming, {processed}/{total} SKUs already done")
+        logger.info(f"Found {total} distinct SKUs to parse ({len(entries)} rows)")
+        meter = ThroughputMeter(total, processed)
+
+        skus = {row: sku for sku, rows in groups.items() for row in rows}
+
+        def mark_written(flushed):
+            # Row is done only once it has been written back
+            for row, result in flushed:
+                store.mark_row(task_id, row, skus[row], result.get("error", ""))
+
+        buffer = SheetWriteBuffer(
+            sheets, spreadsheet_id, sheet_name,
+            flush_rows=SHEETS_FLUSH_ROWS,
+            flush_interval=SHEETS_FLUSH_SECONDS,
+            on_written=mark_written
+        )
+
+        pending = iter([(sku, rows) for sku, rows in groups.items() if not done.issuperset(rows)])
+
+        async def parse_next():
+            nonlocal processed, errors
+            # Workers share one iterator: each SKU is taken exactly once
+            for sku, sku_rows in pending:
+                try:
+                    # Parse product
+                    async with scheduler.slots.slot(spreadsheet_id, BULK, weight):
+                        result = await parser.parse_product(sku)
+                    processed += 1
+
+                    if result.get("error"):
+                        errors += 1
+                        logger.warning(f"[{processed}/{total}] SKU {sku}: {result['error']}")
+                    else:
+                        logger.info(f"[{processed}/{total}] SKU {sku}: {result['price']} RUB")
+
+                    # Fan the result out to every row with this SKU; blocks are
+                    # written in the background
+                    # (request pacing is done by the parser's per-host rate limit)
+                    for row_num in sku_rows:
+                        buffer.add(row_num, result)
+                    store.update(task_id, processed=processed, errors=errors, progress=f"{processed}/{total}")
+
+                    events.publish(task_id, "result", {
+                        "sku": sku,
+                        "rows": sku_rows,
+                        "result": result,
+                        "processed": processed,
+                        "total": total,
+                        "errors": errors,
+                        **meter.eta(processed)
+                    })
+
+                except Exception as e:
+                    logger.error(f"Error parsing SKU {sku}: {e}")
                     errors += 1
-                    logger.warning(f"[{i}/{total}] SKU {sku}: {result['error']}")
-                else:
-                    logger.info(f"[{i}/{total}] SKU {sku}: {result['price']} RUB")
-
-                # Update progress
-                tasks[task_id]["processed"] = i
-                tasks[task_id]["errors"] = errors
-                tasks[task_id]["progress"] = f"{i}/{total}"
-
-                # Write result immediately to sheet
-                row_num = start_row + i - 1
-                sheets.write_result(spreadsheet_id, sheet_name, row_num, result)
-
-                # Delay between requests (2-4 sec)
-                if i < total:
-                    await asyncio.sleep(2.5)
-
-            except Exception as e:
-                logger.error(f"Error parsing SKU {sku}: {e}")
-                errors += 1
-                tasks[task_id]["errors"] = errors
-
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["completed_at"] = datetime.utcnow().isoformat()
+                    store.update(task_id, errors=errors)
+
+        # Writes rows out on time even when no new result arrives for a while
+        flusher = asyncio.create_task(buffer.flush_periodically())
+        try:
+            # One worker more than there are slots keeps a SKU of this task
+            # queued while all slots are busy, so the fair queue can weigh it
+            await asyncio.gather(*(parse_next() for _ in range(scheduler.slots.capacity + 1)))
+
+        finally:
+            # Task end, failure or shutdown: write out what is still buffered
+            flusher.cancel()
+            await buffer.close()
+            if len(buffer):
+                logger.error(f"Task {task_id}: {len(buffer)} rows not written, will be re-parsed on resume")
+
+        store.update(task_id, status="completed", completed_at=datetime.utcnow().isoformat())
         logger.info(f"Task {task_id} completed: {total - errors}/{total} successful")
 
+    except asyncio.CancelledError:
+        # Shutdown keeps the task resumable; any other cancel ends it, so its
+        # idempotency key is free again
+        if not scheduler.closing and store.get(task_id)["status"] in store.UNFINISHED:
+            logger.warning(f"Task {task_id} cancelled")
+            store.update(task_id, status="cancelled", completed_at=datetime.utcnow().isoformat())
+        raise
+
     except Exception as e:
         logger.error(f"Task {task_id} failed: {e}")
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["progress"] = str(e)
+        store.update(task_id, status="failed", progress=str(e))
+
+    finally:
+        final = store.get(task_id)
+        events.publish(task_id, "done", {field: final[field] for field in TaskStatus.model_fields})
+
+
+def resume_unfinished_tasks(parser, store, events: TaskEventHub, scheduler: JobScheduler) -> List[asyncio.Task]:
+    """Re-queue tasks that were pending/running when the process stopped"""
+    resumed = []
+    for task in store.unfinished():
+        logger.info(f"Resuming task {task['task_id']} ({task['status']}, {task['progress']})")
+        resumed.append(scheduler.submit(
+            task["task_id"],
+            task["spreadsheet_id"],
+            lambda task=task: run_parsing_task(task, parser, store, events, scheduler),
+            weight=task["weight"]
+        ))
+    return resumed
@@ -0,0 +1,258 @@
+"""
+Browser Pool
+Isolated BrowserContext/Page leases and a per-host request rate limit
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+from loguru import logger
+
+
+class PageLease:
+    """One isolated context with its own page, checked out by a single caller"""
+
+    def __init__(self, index: int, context, page, blocker=None):
+        self.index = index
+        self.context = context
+        self.page = page
+        self.blocker = blocker
+        self.navigations = 0
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception as e:
+            logger.warning(f"Error closing context #{self.index}: {e}")
+
+
+class BrowserPool:
+    """
+    Fixed-size pool of page leases.
+
+    Each lease owns its own BrowserContext, so cookies, navigation and
+    in-flight requests never leak between concurrent callers.
+
+    A lease is replaced with a fresh context once it has served
+    recycle_after navigations. recycle_all() waits until every lease is
+    back, then rebuilds them all (e.g. after relaunching the browser);
+    new checkouts wait at a gate meanwhile and then get one of the new
+    contexts.
+    """
+
+    # recycle_all() relaunch attempts and the backoff before each retry (s)
+    REBUILD_ATTEMPTS = 3
+    REBUILD_BACKOFF = 5.0
+
+    def __init__(self, size: int = 2, recycle_after: int = 0):
+        self.size = max(1, size)
+        self.recycle_after = recycle_after  # 0 = never recycle contexts
+        self.recycled = 0
+        # Why the pool was shut down after a failed rebuild (None = healthy)
+        self.failure: Optional[str] = None
+        self._leases: List[PageLease] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._factory: Optional[Callable[[int], Awaitable[PageLease]]] = None
+        # Cleared while recycle_all() drains the pool: new checkouts must not
+        # queue ahead of it for returned leases
+        self._ready = asyncio.Event()
+        self._ready.set()
+
+    @property
+    def is_open(self) -> bool:
+        return self._idle is not None
+
+    @property
+    def available(self) -> int:
+        return self._idle.qsize() if self._idle else 0
+
+    async def open(self, factory: Callable[[int], Awaitable[PageLease]]):
+        """Create all leases using factory(index)"""
+        self._factory = factory
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        created = []
+        try:
+            for i in range(self.size):
+                created.append(await factory(i))
+        except Exception:
+            for lease in created:
+                await lease.close()
+            raise
+        for lease in created:
+            self._leases.append(lease)
+            self._idle.put_nowait(lease)
+        self.failure = None
+        logger.info(f"Browser pool opened with {self.size} contexts")
+
+    @asynccontextmanager
+    async def lease(self):
+        """Check out a lease for the duration of the block"""
+        if not self._idle:
+            raise RuntimeError("Browser pool is not open")
+
+        await self._ready.wait()
+        if not self._idle:
+            raise RuntimeError(self.failure or "Browser pool is closed")
+
+        lease = await self._idle.get()
+        if lease is None:
+            # Pool was closed while we were waiting - wake the next waiter too
+            self._idle.put_nowait(None)
+            raise RuntimeError("Browser pool is closed")
+
+        try:
+            yield lease
+        finally:
+            if self.recycle_after and lease.navigations >= self.recycle_after:
+                lease = await self._replace(lease)
+            self._idle.put_nowait(lease)
+
+    async def _replace(self, lease: PageLease) -> PageLease:
+        """Fresh context in place of a worn one; keeps the old one on failure"""
+        try:
+            fresh = await self._factory(lease.index)
+        except Exception as e:
+            logger.error(f"Failed to recycle context #{lease.index}: {e}")
+            return lease
+
+        await lease.close()
+        self._leases[self._leases.index(lease)] = fresh
+        self.recycled += 1
+        logger.info(f"Context #{lease.index} recycled after {lease.navigations} navigations")
+        return fresh
+
+    async def recycle_all(self, restart: Optional[Callable[[], Awaitable]] = None):
+        """
+        Take every lease back, close them, run restart() and rebuild the pool.
+        Blocks new checkouts until done; in-flight parses finish first.
+
+        The rebuild is retried with backoff; if every attempt fails the pool
+        is closed (is_open turns False, `failure` says why) and waiting
+        callers are woken with an error.
+        """
+        self._ready.clear()
+        try:
+            await self._rebuild(restart)
+        finally:
+            self._ready.set()
+
+    async def _rebuild(self, restart: Optional[Callable[[], Awaitable]]):
+        # Only callers that were already waiting compete for returned leases
+        taken = [await self._idle.get() for _ in range(self.size)]
+        for lease in taken:
+            if lease:
+                await lease.close()
+        self._leases.clear()
+
+        for attempt in range(1, self.REBUILD_ATTEMPTS + 1):
+            try:
+                if restart:
+                    await restart()
+                await self.open(self._factory)
+                return
+            except Exception as e:
+                logger.error(f"Failed to rebuild browser pool (attempt {attempt}/{self.REBUILD_ATTEMPTS}): {e}")
+                error = e
+                if attempt < self.REBUILD_ATTEMPTS:
+                    await asyncio.sleep(self.REBUILD_BACKOFF * 2 ** (attempt - 1))
+
+        self.failure = f"Browser rebuild failed: {error}"
+        self._idle.put_nowait(None)
+        self._idle = None
+        raise error
+
+    async def close(self):
+        for lease in self._leases:
+            await lease.close()
+        self._leases.clear()
+        if self._idle:
+            # Wake callers still waiting for a lease
+            self._idle.put_nowait(None)
+        self._idle = None
+        self._ready.set()
+
+
+def descendants_rss_mb() -> Optional[float]:
+    """
+    Total RSS of all child processes of this process (the browser and its
+    renderers), in MB. None when it can't be measured on this platform.
+    """
+    try:
+        import psutil
+        children = psutil.Process().children(recursive=True)
+        total = 0
+        for child in children:
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+    except ImportError:
+        pass
+
+    if not os.path.isdir("/proc"):
+        return None
+
+    # Linux without psutil: build the process tree from /proc/<pid>/stat
+    parents: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            # Fields after the "(comm)" part: state, ppid, ...
+            parents[int(entry)] = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+    tree = {os.getpid()}
+    changed = True
+    while changed:
+        changed = False
+        for pid, ppid in parents.items():
+            if ppid in tree and pid not in tree:
+                tree.add(pid)
+                changed = True
+    tree.discard(os.getpid())
+
+    total_kb = 0
+    for pid in tree:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+class HostRateLimiter:
+    """
+    Global per-host rate limit.
+
+    Callers reserve the next free slot for a host and sleep until it comes,
+    so concurrent leases never hit one host more often than min_interval.
+    """
+
+    def __init__(self, min_interval: float = 2.5):
+        self.min_interval = min_interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str):
+        host = urlparse(url).hostname or ""
+        loop = asyncio.get_running_loop()
+
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.min_interval
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
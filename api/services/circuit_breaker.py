@@ -0,0 +1,133 @@
+"""
+Circuit Breaker
+Process-wide pause on bursts of Ozon block pages
+
+When most recent pages are antibot/captcha pages or HTTP 429, every further
+request is certain to fail too. The breaker opens, all callers wait for a
+cool-down, then a single half-open probe decides: success closes the
+breaker, another block reopens it with a doubled cool-down.
+
+ozon_parser/circuit_breaker.py is the standalone scripts' copy.
+"""
+
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Dict
+from loguru import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Block page or rate limit; other errors (not found, timeouts) do not count
+_BLOCK = re.compile(r"antibot|captcha|^HTTP 429\b", re.IGNORECASE)
+
+
+def is_blocked(result: Dict) -> bool:
+    """Whether any engine attempt for this SKU hit a block page"""
+    if result.get("blocked") or _BLOCK.search(result.get("error") or ""):
+        return True
+    return any(_BLOCK.search(a.get("error") or "") for a in result.get("attempts", []))
+
+
+class CircuitBreaker:
+    """
+    Opens once the block rate over the last `window` results reaches
+    `threshold` (with at least `min_requests` results).
+
+    acquire() before a request: returns at once while closed, waits while
+    open, and lets exactly one caller through as the half-open probe
+    (returns True for it). record() after the request with the outcome.
+    """
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_requests: int = 5,
+        threshold: float = 0.5,
+        cooldown: float = 120.0,
+        max_cooldown: float = 900.0,
+        probe_timeout: float = 120.0
+    ):
+        self.window = window
+        self.min_requests = min_requests
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+
+        self.state = CLOSED
+        self.cooldown = cooldown
+        self.trips = 0
+        self._results: deque = deque(maxlen=window)
+        self._open_until = 0.0
+        self._probe_started = 0.0
+
+    @property
+    def block_rate(self) -> float:
+        return sum(self._results) / len(self._results) if self._results else 0.0
+
+    async def acquire(self) -> bool:
+        while True:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return False
+
+            if self.state == OPEN:
+                if now < self._open_until:
+                    await asyncio.sleep(self._open_until - now)
+                    continue
+                self.state = HALF_OPEN
+                self._probe_started = now
+                logger.info("Circuit half-open: sending one probe request")
+                return True
+
+            # Half-open: wait for the probe, or replace it if it never reported back
+            if now - self._probe_started > self.probe_timeout:
+                self._probe_started = now
+                return True
+            await asyncio.sleep(1.0)
+
+    def record(self, blocked: bool, probe: bool = False) -> bool:
+        """Count one request outcome; True if this opened the breaker"""
+        if self.state == HALF_OPEN:
+            if not probe:
+                return False  # admitted before the breaker opened
+            if blocked:
+                self._open(min(self.cooldown * 2, self.max_cooldown), "probe blocked")
+                return True
+            self.state = CLOSED
+            self.cooldown = self.base_cooldown
+            self._results.clear()
+            logger.info("Circuit closed: probe got through")
+            return False
+
+        if self.state == OPEN:
+            return False
+
+        self._results.append(1 if blocked else 0)
+        if len(self._results) >= self.min_requests and self.block_rate >= self.threshold:
+            self._open(self.cooldown, f"block rate {self.block_rate:.0%} over {len(self._results)} requests")
+            return True
+        return False
+
+    def _open(self, cooldown: float, reason: str):
+        self.state = OPEN
+        self.cooldown = cooldown
+        self.trips += 1
+        self._open_until = time.monotonic() + cooldown
+        self._results.clear()
+        logger.warning(f"Circuit open for {cooldown:.0f}s ({reason})")
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "block_rate": round(self.block_rate, 3),
+            "window": len(self._results),
+            "trips": self.trips,
+            "cooldown_seconds": self.cooldown,
+            "reopens_in_seconds": round(max(0.0, self._open_until - time.monotonic()), 1)
+            if self.state == OPEN else 0,
+        }
@@ -0,0 +1,141 @@
+"""
+HTTP Engine
+Fetch product pages with a pooled HTTP/2 client and scan JSON-LD from the stream
+"""
+
+import json
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    logger.warning("httpx not available")
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+DEFAULT_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+# Stop reading a page after this many characters even if nothing was found
+MAX_SCAN_CHARS = 3_000_000
+
+
+class JsonLdScanner(HTMLParser):
+    """
+    Incremental HTML scanner for <script type="application/ld+json"> blocks.
+
+    Feed it chunks as they arrive; `product` is set as soon as a Product
+    block has been closed, so the caller can stop reading the response.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.product: Optional[Dict] = None
+        self._buf: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script" and dict(attrs).get("type") == "application/ld+json":
+            self._buf = []
+
+    def handle_data(self, data):
+        if self._buf is not None:
+            self._buf.append(data)
+
+    def handle_endtag(self, tag):
+        if tag != "script" or self._buf is None:
+            return
+
+        text = "".join(self._buf)
+        self._buf = None
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return
+
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict) and item.get("@type") == "Product":
+                self.product = item
+                return
+
+
+class HttpEngine:
+    """
+    Pooled httpx.AsyncClient that tries to get JSON-LD without a browser.
+
+    fetch_jsonld() returns (jsonld, None) on success or (None, reason) when
+    the caller should escalate to the browser.
+    """
+
+    def __init__(self, user_agent: str, max_connections: int = 4, timeout: float = 15.0):
+        self.user_agent = user_agent
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.client: Optional["httpx.AsyncClient"] = None
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    async def start(self):
+        if not HTTPX_AVAILABLE:
+            return
+
+        self.client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=True,
+            timeout=self.timeout,
+            headers={**DEFAULT_HEADERS, "User-Agent": self.user_agent},
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            )
+        )
+        logger.info(f"HTTP engine started (http2={HTTP2_AVAILABLE})")
+
+    async def close(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    def set_cookies(self, cookies: List[Dict]):
+        """Reuse cookies from a browser context (e.g. after passing antibot)"""
+        if not self.client:
+            return
+        for c in cookies:
+            self.client.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+
+    async def fetch_jsonld(self, url: str) -> Tuple[Optional[Dict], Optional[str]]:
+        if not self.client:
+            return None, "http engine not started"
+
+        scanner = JsonLdScanner()
+        scanned = 0
+
+        try:
+            async with self.client.stream("GET", url) as response:
+                if response.status_code >= 400:
+                    return None, f"HTTP {response.status_code}"
+
+                async for chunk in response.aiter_text():
+                    scanner.feed(chunk)
+                    scanned += len(chunk)
+                    if scanner.product or scanned > MAX_SCAN_CHARS:
+                        break
+
+        except httpx.HTTPError as e:
+            return None, f"{type(e).__name__}: {str(e)[:80]}"
+
+        if scanner.product:
+            return scanner.product, None
+        return None, "JSON-LD not in HTML"
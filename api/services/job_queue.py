@@ -0,0 +1,155 @@
+"""
+Job Queue
+SKU jobs for out-of-process parser workers (Redis or SQLite)
+
+The API enqueues SKUs and waits for results; workers (ozon_parser/queue_worker.py)
+lease a job, heartbeat while parsing and push the result back. A lease
+that is not renewed in time returns the job to the queue, so a crashed
+worker only delays its SKU.
+
+ozon_parser/job_queue.py is the worker-side copy of this protocol; keep the
+Redis key layout and the SQLite schema in sync.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+from loguru import logger
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class SqliteJobQueue:
+    """File-backed queue for local testing (API and workers on one machine)"""
+
+    def __init__(self, path: str = "data/jobs.db"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                sku TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        logger.info(f"Job queue: sqlite {path}")
+
+    def _execute(self, sql: str, params=()) -> list:
+        # One connection is shared by the threads calling into the queue
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def enqueue(self, sku: str) -> str:
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (job_id, sku, status, created_at) VALUES (?, ?, 'pending', ?)",
+            (job_id, sku, time.time())
+        )
+        return job_id
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        rows = self._execute("SELECT status, result FROM jobs WHERE job_id = ?", (job_id,))
+        if rows and rows[0][0] == "done":
+            return json.loads(rows[0][1])
+        return None
+
+    def cancel(self, job_id: str):
+        self._execute("DELETE FROM jobs WHERE job_id = ? AND status != 'done'", (job_id,))
+
+    def stats(self) -> Dict:
+        counts = dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        workers = self._execute(
+            "SELECT COUNT(DISTINCT worker) FROM jobs WHERE status = 'leased' AND lease_until > ?", (time.time(),)
+        )[0][0]
+        return {
+            "backend": "sqlite",
+            "pending": counts.get("pending", 0),
+            "leased": counts.get("leased", 0),
+            "done": counts.get("done", 0),
+            "active_workers": workers,
+        }
+
+    def close(self):
+        self._db.close()
+
+
+class RedisJobQueue:
+    """
+    Redis (or any Redis-compatible server) queue.
+
+    Keys (prefix "ozon:"):
+      jobs:pending  LIST  job ids, LPUSH by the API, RPOP by workers
+      jobs:leases   ZSET  job id -> lease deadline (unix time)
+      job:{id}      HASH  sku, status, worker, attempts, result
+    """
+
+    PREFIX = "ozon:"
+
+    def __init__(self, url: str):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is not installed (pip install redis)")
+        self.url = url
+        self.r = redis.Redis.from_url(url, decode_responses=True)
+        logger.info(f"Job queue: redis {url.split('@')[-1]}")
+
+    def _key(self, name: str) -> str:
+        return self.PREFIX + name
+
+    def enqueue(self, sku: str) -> str:
+        job_id = uuid.uuid4().hex
+        pipe = self.r.pipeline()
+        pipe.hset(self._key(f"job:{job_id}"), mapping={"sku": sku, "status": "pending", "attempts": 0})
+        pipe.lpush(self._key("jobs:pending"), job_id)
+        pipe.execute()
+        return job_id
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        status, result = self.r.hmget(self._key(f"job:{job_id}"), "status", "result")
+        if status == "done" and result:
+            return json.loads(result)
+        return None
+
+    def cancel(self, job_id: str):
+        pipe = self.r.pipeline()
+        pipe.lrem(self._key("jobs:pending"), 0, job_id)
+        pipe.zrem(self._key("jobs:leases"), job_id)
+        pipe.delete(self._key(f"job:{job_id}"))
+        pipe.execute()
+
+    def stats(self) -> Dict:
+        now = time.time()
+        return {
+            "backend": "redis",
+            "pending": self.r.llen(self._key("jobs:pending")),
+            "leased": self.r.zcard(self._key("jobs:leases")),
+            "expired_leases": self.r.zcount(self._key("jobs:leases"), "-inf", now),
+        }
+
+    def close(self):
+        self.r.close()
+
+
+def open_job_queue(url: str):
+    """redis://... or rediss://... -> RedisJobQueue, sqlite:///path or a path -> SqliteJobQueue"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobQueue(url)
+    return SqliteJobQueue(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url)
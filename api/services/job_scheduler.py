@@ -0,0 +1,167 @@
+"""
+Job Scheduler
+Admission control, priorities and per-spreadsheet fairness for parse work
+"""
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+
+
+# Priority levels: lower runs first
+INTERACTIVE = 0
+BULK = 10
+
+
+class FairQueue:
+    """
+    Capacity-limited async semaphore with priorities and weighted fairness.
+
+    Waiters are served by (priority, virtual finish tag). Tags follow
+    start-time fair queueing: each key advances its own virtual clock by
+    1/weight per grant, so keys with equal weight alternate and a key with
+    weight 2 gets twice the grants, no matter how many waiters each has.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.active = 0
+        self._heap: List[list] = []
+        self._vtime = 0.0
+        self._finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for entry in self._heap if not entry[3].done())
+
+    def _tag(self, key: str, weight: float) -> float:
+        start = max(self._vtime, self._finish.get(key, 0.0))
+        finish = start + 1.0 / max(weight, 0.01)
+        self._finish[key] = finish
+        return finish
+
+    async def acquire(self, key: str, priority: int = BULK, weight: float = 1.0):
+        tag = self._tag(key, weight)
+        if self.active < self.capacity and not self.waiting:
+            self.active += 1
+            self._vtime = max(self._vtime, tag - 1.0 / max(weight, 0.01))
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, [priority, tag, next(self._seq), future])
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted right before the cancel: pass the slot on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._heap:
+            _, tag, _, future = heapq.heappop(self._heap)
+            if future.done():
+                continue
+            self._vtime = max(self._vtime, tag)
+            future.set_result(None)
+            return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, key: str, priority: int = BULK, weight: float = 1.0):
+        await self.acquire(key, priority, weight)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class JobScheduler:
+    """
+    In-process scheduler for parse jobs.
+
+    Two levels share the same ordering rules:
+    - jobs: at most max_jobs sheet tasks run at once, the rest are queued
+    - slots: each SKU of a running job takes one of `slots` parser slots
+      (one per browser context), so an interactive /parse/test request
+      gets the next free slot ahead of queued bulk SKUs
+    """
+
+    def __init__(self, max_jobs: int = 2, slots: int = 2):
+        self.jobs = FairQueue(max_jobs)
+        self.slots = FairQueue(slots)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._info: Dict[str, Dict] = {}
+        # Set by close(): jobs cancelled on shutdown stay resumable
+        self.closing = False
+
+    def submit(
+        self,
+        job_id: str,
+        key: str,
+        run: Callable[[], Awaitable],
+        priority: int = BULK,
+        weight: float = 1.0
+    ) -> asyncio.Task:
+        """Queue a job; run() starts once a job slot is free"""
+        info = {"job_id": job_id, "key": key, "priority": priority, "weight": weight, "state": "queued"}
+
+        async def wrapper():
+            await self.jobs.acquire(key, priority, weight)
+            info["state"] = "running"
+            try:
+                await run()
+            finally:
+                self.jobs.release()
+
+        task = asyncio.create_task(wrapper())
+        self._tasks[job_id] = task
+        self._info[job_id] = info
+        task.add_done_callback(lambda _: self._forget(job_id))
+        logger.info(f"Job {job_id} queued (key={key}, priority={priority}, queued jobs={self.jobs.waiting})")
+        return task
+
+    def _forget(self, job_id: str):
+        self._tasks.pop(job_id, None)
+        self._info.pop(job_id, None)
+
+    def state(self, job_id: str) -> Optional[str]:
+        info = self._info.get(job_id)
+        return info["state"] if info else None
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a queued or running job; returns its state, None if unknown"""
+        task = self._tasks.get(job_id)
+        if not task:
+            return None
+        state = self._info[job_id]["state"]
+        task.cancel()
+        logger.info(f"Job {job_id} cancelled ({state})")
+        return state
+
+    def stats(self) -> Dict:
+        return {
+            "jobs": {
+                "running": self.jobs.active,
+                "queued": self.jobs.waiting,
+                "max": self.jobs.capacity,
+                "list": list(self._info.values()),
+            },
+            "slots": {
+                "busy": self.slots.active,
+                "waiting": self.slots.waiting,
+                "max": self.slots.capacity,
+            },
+        }
+
+    async def close(self):
+        """Cancel every job and wait for them to wind down"""
+        self.closing = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -9,34 +9,92 @@ from datetime import datetime
 from loguru import logger
 
 try:
-    from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+    from playwright.async_api import async_playwright, Browser
     from playwright_stealth import stealth_async
     PLAYWRIGHT_AVAILABLE = True
 except ImportError:
     PLAYWRIGHT_AVAILABLE = False
     logger.warning("Playwright not available")
 
+from api.services.circuit_breaker import CircuitBreaker, is_blocked
+from api.services.browser_pool import BrowserPool, HostRateLimiter, PageLease, descendants_rss_mb
+from api.services.resource_blocker import ResourceBlocker, PROFILES, DEFAULT_PROFILE
+from api.services.page_ready import wait_until_ready, PRODUCT_READY, READY_TIMEOUT
+from api.services.page_probe import probe_page
+from api.services.http_engine import HttpEngine
+from api.services.result_cache import ResultCache
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
 
 class OzonParserService:
     """Service for parsing Ozon product pages"""
 
-    def __init__(self, headless: bool = True, delay: float = 2.5):
+    def __init__(
+        self,
+        headless: bool = True,
+        delay: float = 2.5,
+        pool_size: int = 2,
+        resource_profile: str = DEFAULT_PROFILE,
+        ready_timeout: float = READY_TIMEOUT,
+        http_first: bool = True,
+        cache: Optional[ResultCache] = None,
+        context_recycle_after: int = 0,
+        browser_recycle_after: int = 0,
+        max_browser_rss_mb: float = 0,
+        job_queue=None,
+        queue_timeout: float = 300.0,
+        circuit_breaker: Optional[CircuitBreaker] = None
+    ):
+        if resource_profile not in PROFILES:
+            raise ValueError(f"Unknown resource profile: {resource_profile}")
+
         self.headless = headless
-        self.delay = delay
+        self.delay = delay  # Min interval between requests to the same host
+        self.resource_profile = resource_profile
+        self.ready_timeout = ready_timeout  # Ceiling for waiting on JSON-LD
         self.browser: Optional[Browser] = None
-        self.context: Optional[BrowserContext] = None
-        self.page: Optional[Page] = None
+        self.pool = BrowserPool(pool_size, recycle_after=context_recycle_after)
+        self.rate_limiter = HostRateLimiter(delay)
+        # Shared by all contexts: pauses every navigation during block bursts
+        self.breaker = circuit_breaker or CircuitBreaker()
+        self.http_engine = HttpEngine(USER_AGENT, max_connections=pool_size * 2) if http_first else None
+        self.cache = cache
+
+        # Browser recycling (0 = off): after N navigations or above RSS limit
+        self.browser_recycle_after = browser_recycle_after
+        self.max_browser_rss_mb = max_browser_rss_mb
+        self.browser_restarts = 0
+        self._browser_navigations = 0
+        self._recycle_lock = asyncio.Lock()
+
         self._playwright = None
 
+        # Remote mode: SKUs go to out-of-process workers via the job queue
+        self.job_queue = job_queue
+        self.queue_timeout = queue_timeout
+
     async def start(self):
-        """Initialize browser"""
+        """Initialize HTTP client and browser (nothing to start in remote mode)"""
+        if self.job_queue:
+            logger.info("Parser in remote mode: SKUs are parsed by queue workers")
+            return
+
+        if self.http_engine:
+            await self.http_engine.start()
+
         if not PLAYWRIGHT_AVAILABLE:
             logger.error("Playwright is not installed")
             return
 
         self._playwright = await async_playwright().start()
+        await self._launch_browser()
+        await self.pool.open(self._new_lease)
+
+        logger.info(f"Browser started (headless={self.headless}, contexts={self.pool.size})")
 
-        # Launch browser with stealth settings
+    async def _launch_browser(self):
+        """Launch browser with stealth settings"""
         self.browser = await self._playwright.chromium.launch(
             headless=self.headless,
             args=[
@@ -48,37 +106,96 @@ class OzonParserService:
                 "--lang=en-US",
             ]
         )
+        self._browser_navigations = 0
 
+    async def _new_lease(self, index: int) -> PageLease:
+        """Create an isolated context with a stealth page"""
         # Create context with realistic settings
-        self.context = await self.browser.new_context(
+        context = await self.browser.new_context(
             viewport={"width": 1920, "height": 1080},
             locale="en-US",
             timezone_id="Europe/Moscow",
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+            user_agent=USER_AGENT
         )
 
-        self.page = await self.context.new_page()
+        page = await context.new_page()
 
         # Apply stealth patches
-        await stealth_async(self.page)
+        await stealth_async(page)
 
-        logger.info(f"Browser started (headless={self.headless})")
+        # Abort images, fonts, trackers etc. we never read
+        blocker = ResourceBlocker(self.resource_profile)
+        await blocker.attach(page)
+
+        return PageLease(index, context, page, blocker)
 
     async def close(self):
         """Close browser"""
-        if self.context:
-            await self.context.close()
+        if self.http_engine:
+            await self.http_engine.close()
+        await self.pool.close()
+        if self.cache:
+            self.cache.close()
+        if self.job_queue:
+            self.job_queue.close()
         if self.browser:
             await self.browser.close()
         if self._playwright:
             await self._playwright.stop()
         logger.info("Browser closed")
 
-    async def parse_product(self, sku: str) -> Dict:
+    async def parse_product(self, sku: str, use_cache: bool = True) -> Dict:
         """
         Parse single product by SKU.
+        Served from the result cache when a fresh entry exists; concurrent
+        calls for the same SKU share one page load.
+        """
+        if self.cache and use_cache:
+            return await self.cache.get_or_fetch(sku, lambda: self._fetch_product(sku))
+        return await self._fetch_product(sku)
+
+    async def _fetch_remote(self, sku: str) -> Dict:
+        """Enqueue the SKU and wait for a worker to push the result"""
+        job_id = await asyncio.to_thread(self.job_queue.enqueue, sku)
+        deadline = asyncio.get_running_loop().time() + self.queue_timeout
+        poll = 0.2
+
+        try:
+            while asyncio.get_running_loop().time() < deadline:
+                result = await asyncio.to_thread(self.job_queue.result, job_id)
+                if result is not None:
+                    return result
+                await asyncio.sleep(poll)
+                poll = min(poll * 1.5, 2.0)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(self.job_queue.cancel, job_id)
+            raise
+
+        await asyncio.to_thread(self.job_queue.cancel, job_id)
+        return {
+            "sku": sku,
+            "error": f"No worker result in {self.queue_timeout:.0f}s",
+            "parsed_at": datetime.utcnow().isoformat(),
+            "engine": "queue"
+        }
+
+    async def _fetch_product(self, sku: str) -> Dict:
+        """
+        Load product by SKU.
         Uses JSON-LD Schema for reliable data extraction.
+
+        Tries a plain HTTP fetch first and escalates to a browser page
+        only when the JSON-LD is not in the initial HTML.
         """
+        if self.job_queue:
+            return await self._fetch_remote(sku)
+
+        probe = await self.breaker.acquire()
+        result = await self._load_product(sku)
+        self.breaker.record(is_blocked(result), probe)
+        return result
+
+    async def _load_product(self, sku: str) -> Dict:
         url = f"https://www.ozon.ru/product/{sku}/"
 
         result = {
@@ -91,16 +208,102 @@ class OzonParserService:
             "reviews": 0,
             "availability": "",
             "error": "",
-            "parsed_at": datetime.utcnow().isoformat()
+            "parsed_at": datetime.utcnow().isoformat(),
+            "engine": "",
+            "attempts": []
         }
 
-        if not self.page:
+        # Most product pages ship JSON-LD in the initial HTML
+        if self.http_engine and self.http_engine.available:
+            await self.rate_limiter.wait(url)
+            jsonld_data, reason = await self.http_engine.fetch_jsonld(url)
+            result["attempts"].append({"engine": "http", "error": reason or ""})
+
+            if jsonld_data or reason == "HTTP 404":
+                result["engine"] = "http"
+                if reason:
+                    result["error"] = reason
+                else:
+                    self._apply_jsonld(sku, jsonld_data, result)
+                return result
+
+            logger.debug(f"SKU {sku}: HTTP engine failed ({reason}), escalating to browser")
+
+        if not self.pool.is_open:
             result["error"] = "Browser not initialized"
             return result
 
+        async with self.pool.lease() as lease:
+            await self.rate_limiter.wait(url)
+            lease.blocker.reset()
+            result["engine"] = "browser"
+            await self._parse_page(lease, url, sku, result)
+            result["traffic"] = lease.blocker.stats()
+            result["attempts"].append({"engine": "browser", "error": result["error"]})
+
+            # Let the HTTP engine reuse cookies of a context that got through
+            if self.http_engine and not result["error"]:
+                self.http_engine.set_cookies(await lease.context.cookies())
+
+        await self._maybe_recycle_browser()
+        return result
+
+    async def _maybe_recycle_browser(self):
+        """
+        Relaunch the browser between SKUs once it has served
+        browser_recycle_after navigations or its processes exceed
+        max_browser_rss_mb. Callers waiting for a lease just wait a bit longer.
+        """
+        if self._recycle_lock.locked():
+            return
+
+        reason = None
+        if self.browser_recycle_after and self._browser_navigations >= self.browser_recycle_after:
+            reason = f"{self._browser_navigations} navigations"
+        elif self.max_browser_rss_mb:
+            rss = descendants_rss_mb()
+            if rss and rss > self.max_browser_rss_mb:
+                reason = f"RSS {rss:.0f} MB > {self.max_browser_rss_mb:.0f} MB"
+
+        if not reason:
+            return
+
+        async with self._recycle_lock:
+            logger.info(f"Recycling browser ({reason})")
+            try:
+                await self.pool.recycle_all(self._restart_browser)
+                self.browser_restarts += 1
+            except Exception as e:
+                logger.error(f"Browser recycle failed: {e}")
+
+    def browser_state(self) -> Dict:
+        """Pool state for /health; `failure` is set once a relaunch gave up"""
+        if self.job_queue:
+            return {"mode": "remote"}
+        return {
+            "mode": "local",
+            "open": self.pool.is_open,
+            "available": self.pool.available,
+            "restarts": self.browser_restarts,
+            "failure": self.pool.failure,
+        }
+
+    async def _restart_browser(self):
+        try:
+            await self.browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser: {e}")
+        await self._launch_browser()
+
+    async def _parse_page(self, lease: PageLease, url: str, sku: str, result: Dict):
+        """Load product page on a leased context and fill result"""
+        page = lease.page
+
         try:
             # Navigate to product page
-            response = await self.page.goto(
+            lease.navigations += 1
+            self._browser_navigations += 1
+            response = await page.goto(
                 url,
                 wait_until="domcontentloaded",
                 timeout=30000
@@ -108,40 +311,38 @@ class OzonParserService:
 
             if response and response.status >= 400:
                 result["error"] = f"HTTP {response.status}"
-                return result
+                return
 
-            # Wait for page to load
-            await asyncio.sleep(2)
+            # Wait until JSON-LD is in the DOM (or an antibot page shows up)
+            result["ready_ms"] = await wait_until_ready(page, PRODUCT_READY, self.ready_timeout)
 
-            # Check for antibot
-            title = await self.page.title()
-            if "Antibot" in title or "Challenge" in title:
-                logger.warning(f"Antibot detected for SKU {sku}, waiting...")
-                await asyncio.sleep(5)
+            # Title, antibot check and JSON-LD in one round-trip
+            probe = await probe_page(page)
+            if probe["block"]:
+                logger.warning(f"Antibot detected for SKU {sku} ({probe['block']}), waiting...")
+                result["ready_ms"] = await wait_until_ready(page, PRODUCT_READY, 5, stop_on_block=False)
 
                 # Check again
-                title = await self.page.title()
-                if "Antibot" in title:
+                probe = await probe_page(page)
+                if probe["block"]:
                     result["error"] = "Blocked by antibot"
-                    return result
+                    return
 
-            # Extract JSON-LD data
-            jsonld_data = await self.page.evaluate("""
-                () => {
-                    const script = document.querySelector('script[type="application/ld+json"]');
-                    if (!script) return null;
-                    try {
-                        return JSON.parse(script.textContent);
-                    } catch(e) {
-                        return null;
-                    }
-                }
-            """)
+            jsonld_data = probe["jsonld"]
 
             if not jsonld_data:
-                result["error"] = "JSON-LD not found"
-                return result
+                result["error"] = "Product not found" if probe["notFound"] else "JSON-LD not found"
+                return
+
+            self._apply_jsonld(sku, jsonld_data, result)
 
+        except Exception as e:
+            result["error"] = str(e)[:100]
+            logger.error(f"Error parsing SKU {sku}: {e}")
+
+    def _apply_jsonld(self, sku: str, jsonld_data: Dict, result: Dict):
+        """Fill result from Product JSON-LD"""
+        try:
             # Parse JSON-LD data
             result["name"] = jsonld_data.get("name", "")
 
@@ -168,5 +369,3 @@ class OzonParserService:
         except Exception as e:
             result["error"] = str(e)[:100]
             logger.error(f"Error parsing SKU {sku}: {e}")
-
-        return result
@@ -0,0 +1,56 @@
+"""
+Page Probe
+One in-page evaluate that replaces title()/content()/evaluate() chains
+"""
+
+from typing import Dict
+
+
+# Runs in the page and returns a small payload:
+#   title    - page title (truncated)
+#   block    - null, "antibot", "captcha" or "denied"
+#   jsonld   - Product JSON-LD reduced to the fields we read
+#   notFound - true on a "product not found" page
+PROBE_JS = """
+    () => {
+        const title = document.title || '';
+
+        let jsonld = null;
+        for (const script of document.querySelectorAll('script[type="application/ld+json"]')) {
+            try {
+                const data = JSON.parse(script.textContent);
+                if (!jsonld || data['@type'] === 'Product') jsonld = data;
+                if (data['@type'] === 'Product') break;
+            } catch (e) {}
+        }
+        if (jsonld) {
+            const keep = ['@type', 'sku', 'name', 'brand', 'offers', 'aggregateRating'];
+            jsonld = Object.fromEntries(keep.filter(k => k in jsonld).map(k => [k, jsonld[k]]));
+        }
+
+        let block = /Antibot|Challenge/i.test(title) ? 'antibot' : null;
+        let notFound = false;
+
+        // Block and 404 pages are small, so reading their text is cheap
+        if (!jsonld) {
+            const text = ((document.body && document.body.innerText) || '').slice(0, 3000).toLowerCase();
+            const lowerTitle = title.toLowerCase();
+            // "robot" only as a title phrase: product pages say it too (robot vacuums)
+            const challenge = document.querySelector(
+                '#challenge, .challenge, form[action*="challenge"], iframe[src*="captcha"]');
+            if (!block && (challenge || /captcha|капч/.test(text) || /не робот|not a robot|are you a robot/.test(lowerTitle))) {
+                block = 'captcha';
+            }
+            if (!block && /доступ ограничен|access denied/.test(text + lowerTitle)) block = 'denied';
+            notFound = /товар не найден|такой страницы нет|page not found/.test(text + lowerTitle);
+        }
+
+        return { title: title.slice(0, 200), block, jsonld, notFound };
+    }
+"""
+
+
+async def probe_page(page) -> Dict:
+    """Title, block-page classification, JSON-LD and not-found flag in one round-trip"""
+    probe = await page.evaluate(PROBE_JS)
+    return probe or {"title": "", "block": None, "jsonld": None, "notFound": False}
@@ -0,0 +1,60 @@
+"""
+Page Readiness
+Event-driven wait for the data we extract instead of fixed sleeps
+"""
+
+import asyncio
+from typing import Optional
+
+
+# Elements that mean the page has the data we need
+PRODUCT_READY = 'script[type="application/ld+json"]'
+SEARCH_READY = '[data-widget="searchResultsV2"]'
+
+# Hard ceiling for one wait (seconds)
+READY_TIMEOUT = 10.0
+
+# True as soon as the selector is attached (or an antibot page is shown)
+_READY_JS = """
+    ([selector, stopOnBlock]) => {
+        if (document.querySelector(selector)) return true;
+        return stopOnBlock && /Antibot|Challenge/i.test(document.title);
+    }
+"""
+
+
+async def wait_until_ready(
+    page,
+    selector: str = PRODUCT_READY,
+    timeout: float = READY_TIMEOUT,
+    stop_on_block: bool = True
+) -> Optional[int]:
+    """
+    Wait until selector appears in the DOM.
+
+    Returns time-to-ready in milliseconds, or None if the ceiling was hit.
+    With stop_on_block the wait also ends on an antibot page, so callers
+    can check the title without sitting out the full ceiling.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + timeout
+
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None
+
+        try:
+            await page.wait_for_function(
+                _READY_JS,
+                arg=[selector, stop_on_block],
+                timeout=remaining * 1000,
+                polling=100
+            )
+            return int((loop.time() - started) * 1000)
+        except Exception as e:
+            if type(e).__name__ == "TimeoutError":
+                return None
+            # Antibot redirect destroyed the execution context - keep waiting
+            await asyncio.sleep(0.1)
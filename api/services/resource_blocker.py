@@ -0,0 +1,98 @@
+"""
+Resource Blocker
+page.route interception profiles that abort resources the parser never reads
+"""
+
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+
+# Hosts whose scripts/XHR are needed for the page (and antibot) to work
+FIRST_PARTY_HOSTS = ("ozon.ru", "ozone.ru", "ozonusercontent.com")
+
+# Resource types aborted per profile; third_party=False aborts foreign hosts
+PROFILES: Dict[str, Dict] = {
+    # Product page: only the HTML with JSON-LD and first-party scripts
+    "jsonld-only": {
+        "blocked_types": {"image", "media", "font", "stylesheet", "texttrack", "manifest"},
+        "third_party": False,
+    },
+    # Search page: tiles are rendered by first-party scripts, keep CSS classes
+    "search-tiles": {
+        "blocked_types": {"image", "media", "font", "texttrack", "manifest"},
+        "third_party": False,
+    },
+    "full": {
+        "blocked_types": set(),
+        "third_party": True,
+    },
+}
+
+DEFAULT_PROFILE = "jsonld-only"
+
+
+def is_first_party(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in FIRST_PARTY_HOSTS)
+
+
+class ResourceBlocker:
+    """
+    Per-page request filter with traffic counters.
+
+    Blocked requests are never downloaded, so only their count is known;
+    allowed bytes are taken from the Content-Length of each response.
+    Call reset() before each navigation to get per-page numbers.
+    """
+
+    def __init__(self, profile: str = DEFAULT_PROFILE):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown resource profile: {profile}. Use one of {list(PROFILES)}")
+        self.profile = profile
+        self.reset()
+
+    def reset(self):
+        self.blocked_requests = 0
+        self.blocked_by_type: Dict[str, int] = {}
+        self.allowed_requests = 0
+        self.allowed_bytes = 0
+
+    def stats(self) -> Dict:
+        return {
+            "profile": self.profile,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": dict(self.blocked_by_type),
+            "allowed_requests": self.allowed_requests,
+            "allowed_bytes": self.allowed_bytes,
+        }
+
+    async def attach(self, page):
+        """Install the route handler and response counter on a page"""
+        await page.route("**/*", self._handle_route)
+        page.on("response", self._on_response)
+
+    def block_reason(self, resource_type: str, url: str) -> Optional[str]:
+        rules = PROFILES[self.profile]
+        if resource_type in rules["blocked_types"]:
+            return resource_type
+        if not rules["third_party"] and not is_first_party(url):
+            return "third_party"
+        return None
+
+    async def _handle_route(self, route):
+        request = route.request
+        reason = self.block_reason(request.resource_type, request.url)
+
+        if reason:
+            self.blocked_requests += 1
+            self.blocked_by_type[reason] = self.blocked_by_type.get(reason, 0) + 1
+            await route.abort()
+        else:
+            self.allowed_requests += 1
+            await route.continue_()
+
+    def _on_response(self, response):
+        try:
+            self.allowed_bytes += int(response.headers.get("content-length", 0))
+        except (TypeError, ValueError):
+            pass
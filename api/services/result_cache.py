@@ -0,0 +1,151 @@
+"""
+Result Cache
+TTL + LRU cache of parse results with singleflight and an optional SQLite tier
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from loguru import logger
+
+
+class _FetchAbandoned(Exception):
+    """The fetch owner was cancelled; waiters should fetch again"""
+
+
+class ResultCache:
+    """
+    Cache of successful parse results keyed by SKU.
+
+    - In-memory LRU with a TTL per entry
+    - Optional on-disk SQLite tier that survives restarts
+    - Concurrent requests for the same key share one in-flight fetch
+
+    Results with an error are never cached.
+    """
+
+    def __init__(self, ttl: float = 600, max_size: int = 5000, db_path: Optional[str] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._memory: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, expires_at REAL, data TEXT)"
+            )
+            self._db.commit()
+            logger.info(f"Result cache SQLite tier: {db_path}")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "size": len(self._memory),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "inflight": len(self._inflight),
+            "disk": self._db is not None,
+        }
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Fresh cached result or None"""
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry:
+            expires_at, result = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                return result
+            del self._memory[key]
+
+        if self._db:
+            row = self._db.execute(
+                "SELECT expires_at, data FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[0] > now:
+                result = json.loads(row[1])
+                self._remember(key, row[0], result)
+                self.disk_hits += 1
+                return result
+
+        return None
+
+    def put(self, key: str, result: Dict):
+        if result.get("error"):
+            return
+
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, result)
+
+        if self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, expires_at, data) VALUES (?, ?, ?)",
+                (key, expires_at, json.dumps(result, ensure_ascii=False))
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, expires_at: float, result: Dict):
+        self._memory[key] = (expires_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Cached result, or the result of one shared fetch for this key"""
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return {**cached, "cached": True}
+
+            inflight = self._inflight.get(key)
+            if not inflight:
+                break
+            self.coalesced += 1
+            try:
+                return dict(await asyncio.shield(inflight))
+            except _FetchAbandoned:
+                continue  # Owner was cancelled: the next waiter runs the fetch itself
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            result = await fetch()
+            self.put(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Cancelling the owner must not cancel waiters from other tasks
+            future.set_exception(_FetchAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the exception; don't warn if nobody was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
@@ -5,12 +5,20 @@ Read SKUs and write parsing results
 
 import os
 import json
-from typing import List, Dict, Optional
-from datetime import datetime
+import time
+import asyncio
+import functools
+import random
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
 from loguru import logger
 
 try:
     import gspread
+    from google.auth.transport.requests import Request as AuthRequest
     from google.oauth2.service_account import Credentials
     GSPREAD_AVAILABLE = True
 except ImportError:
@@ -38,8 +46,18 @@ class GoogleSheetsClient:
         "error": "I"
     }
 
+    # Spreadsheet/worksheet handle cache (saves metadata round-trips)
+    HANDLE_TTL = 600
+    HANDLE_CACHE_SIZE = 64
+
+    # Refresh the access token this long before it expires
+    TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
     def __init__(self):
         self.client: Optional[gspread.Client] = None
+        self.credentials = None
+        self._handles: "OrderedDict[Tuple[str, Optional[str]], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
         self._init_client()
 
     def _init_client(self):
@@ -63,12 +81,60 @@ class GoogleSheetsClient:
 
         try:
             creds_dict = json.loads(creds_json)
-            credentials = Credentials.from_service_account_info(creds_dict, scopes=self.SCOPES)
-            self.client = gspread.authorize(credentials)
+            self.credentials = Credentials.from_service_account_info(creds_dict, scopes=self.SCOPES)
+            self.client = gspread.authorize(self.credentials)
             logger.info("Google Sheets client initialized")
         except Exception as e:
             logger.error(f"Failed to initialize Google Sheets client: {e}")
 
+    def _ensure_token(self):
+        """Refresh the token ahead of expiry instead of on a failed request"""
+        creds = self.credentials
+        if creds is None:
+            return
+        expiry = creds.expiry
+        if creds.token and expiry and expiry - datetime.utcnow() > self.TOKEN_REFRESH_MARGIN:
+            return
+        try:
+            creds.refresh(AuthRequest())
+            logger.debug(f"Google token refreshed, expires {creds.expiry}")
+        except Exception as e:
+            logger.warning(f"Token refresh failed: {e}")
+
+    def _cached(self, key: Tuple[str, Optional[str]], load):
+        """Handle from the TTL/LRU cache, loading it on miss"""
+        # Every API call starts from a handle, cached or not
+        self._ensure_token()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry and entry[0] > now:
+                self._handles.move_to_end(key)
+                return entry[1]
+
+        handle = load()
+        with self._lock:
+            self._handles[key] = (now + self.HANDLE_TTL, handle)
+            self._handles.move_to_end(key)
+            while len(self._handles) > self.HANDLE_CACHE_SIZE:
+                self._handles.popitem(last=False)
+        return handle
+
+    def spreadsheet(self, spreadsheet_id: str):
+        return self._cached((spreadsheet_id, None), lambda: self.client.open_by_key(spreadsheet_id))
+
+    def worksheet(self, spreadsheet_id: str, sheet_name: str):
+        return self._cached(
+            (spreadsheet_id, sheet_name),
+            lambda: self.spreadsheet(spreadsheet_id).worksheet(sheet_name)
+        )
+
+    def invalidate(self, spreadsheet_id: str):
+        """Drop cached handles of a spreadsheet (e.g. after an error)"""
+        with self._lock:
+            for key in [k for k in self._handles if k[0] == spreadsheet_id]:
+                del self._handles[key]
+
     def read_skus(
         self,
         spreadsheet_id: str,
@@ -77,27 +143,83 @@ class GoogleSheetsClient:
         start_row: int = 2
     ) -> List[str]:
         """Read SKUs from column"""
+        return [sku for _, sku in self.read_sku_rows(spreadsheet_id, sheet_name, column, start_row)]
+
+    def read_sku_rows(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str,
+        column: str = "A",
+        start_row: int = 2
+    ) -> List[Tuple[int, str]]:
+        """Read (row number, SKU) pairs from column, skipping empty cells"""
         if not self.client:
             logger.error("Google Sheets client not initialized")
             return []
 
         try:
-            spreadsheet = self.client.open_by_key(spreadsheet_id)
-            worksheet = spreadsheet.worksheet(sheet_name)
+            return self.fetch_sku_rows(spreadsheet_id, sheet_name, column, start_row)
+        except Exception as e:
+            logger.error(f"Error reading SKUs: {e}")
+            self.invalidate(spreadsheet_id)
+            return []
 
-            # Get all values from column
-            col_index = ord(column.upper()) - ord('A') + 1
-            values = worksheet.col_values(col_index)
+    def fetch_sku_rows(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str,
+        column: str = "A",
+        start_row: int = 2
+    ) -> List[Tuple[int, str]]:
+        """read_sku_rows() that raises API errors (for retrying callers)"""
+        worksheet = self.worksheet(spreadsheet_id, sheet_name)
 
-            # Skip header and empty values
-            skus = [v.strip() for v in values[start_row - 1:] if v and v.strip()]
+        # Get all values from column
+        col_index = ord(column.upper()) - ord('A') + 1
+        values = worksheet.col_values(col_index)
 
-            logger.info(f"Read {len(skus)} SKUs from {sheet_name}")
-            return skus
+        # Skip header and empty values, keep real row numbers
+        rows = [
+            (row, v.strip())
+            for row, v in enumerate(values[start_row - 1:], start_row)
+            if v and v.strip()
+        ]
 
-        except Exception as e:
-            logger.error(f"Error reading SKUs: {e}")
-            return []
+        logger.info(f"Read {len(rows)} SKUs from {sheet_name}")
+        return rows
+
+    def fetch_sku_entries(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str,
+        column: str = "A",
+        start_row: int = 2
+    ) -> List[Tuple[int, str, str, str]]:
+        """
+        (row, SKU, parsed_at, error) for every non-empty SKU cell.
+        SKU, date and error columns come back in one batch_get.
+        """
+        worksheet = self.worksheet(spreadsheet_id, sheet_name)
+
+        date_col = self.COLUMNS["parsed_at"]
+        error_col = self.COLUMNS["error"]
+        skus, dates, errors = worksheet.batch_get([
+            f"{column}{start_row}:{column}",
+            f"{date_col}{start_row}:{date_col}",
+            f"{error_col}{start_row}:{error_col}",
+        ])
+
+        def cell(values, i):
+            return str(values[i][0]).strip() if i < len(values) and values[i] else ""
+
+        entries = []
+        for i in range(len(skus)):
+            sku = cell(skus, i)
+            if sku:
+                entries.append((start_row + i, sku, cell(dates, i), cell(errors, i)))
+
+        logger.info(f"Read {len(entries)} SKU rows from {sheet_name}")
+        return entries
 
     def write_result(
         self,
@@ -111,27 +233,62 @@ class GoogleSheetsClient:
             logger.error("Google Sheets client not initialized")
             return
 
-        try:
-            spreadsheet = self.client.open_by_key(spreadsheet_id)
-            worksheet = spreadsheet.worksheet(sheet_name)
-
-            # Prepare values for each column
-            updates = []
-            for field, col in self.COLUMNS.items():
-                value = result.get(field, "")
-                if isinstance(value, (int, float)) and value == 0 and field not in ["price", "rating", "reviews"]:
-                    value = ""
-                cell = f"{col}{row}"
-                updates.append({
-                    "range": cell,
-                    "values": [[value]]
-                })
-
-            # Batch update
-            worksheet.batch_update(updates)
+        self.write_rows(spreadsheet_id, sheet_name, {row: self.row_values(result)})
 
+    @classmethod
+    def row_values(cls, result: Dict) -> List:
+        """Result values in COLUMNS order (B..I)"""
+        values = []
+        for field in cls.COLUMNS:
+            value = result.get(field, "")
+            if isinstance(value, (int, float)) and value == 0 and field not in ["price", "rating", "reviews"]:
+                value = ""
+            values.append(value)
+        return values
+
+    def write_rows(self, spreadsheet_id: str, sheet_name: str, rows: Dict[int, List]) -> bool:
+        """
+        Write several result rows in one values_batch_update.
+        Contiguous rows are merged into one B{n}:I{m} range.
+        """
+        if not self.client:
+            logger.error("Google Sheets client not initialized")
+            return False
+
+        try:
+            self.put_rows(spreadsheet_id, sheet_name, rows)
+            return True
         except Exception as e:
-            logger.error(f"Error writing result to row {row}: {e}")
+            logger.error(f"Error writing rows {min(rows)}-{max(rows)}: {e}")
+            self.invalidate(spreadsheet_id)
+            return False
+
+    def put_rows(self, spreadsheet_id: str, sheet_name: str, rows: Dict[int, List]):
+        """write_rows() that raises API errors (for retrying callers)"""
+        if not rows:
+            return
+
+        first_col = min(self.COLUMNS.values())
+        last_col = max(self.COLUMNS.values())
+
+        # Group sorted row numbers into contiguous runs
+        data = []
+        run: List[int] = []
+        for row in sorted(rows):
+            if run and row != run[-1] + 1:
+                data.append(self._block(sheet_name, run, rows, first_col, last_col))
+                run = []
+            run.append(row)
+        data.append(self._block(sheet_name, run, rows, first_col, last_col))
+
+        self.spreadsheet(spreadsheet_id).values_batch_update({"valueInputOption": "RAW", "data": data})
+
+    @staticmethod
+    def _block(sheet_name: str, run: List[int], rows: Dict[int, List], first_col: str, last_col: str) -> Dict:
+        return {
+            "range": f"'{sheet_name}'!{first_col}{run[0]}:{last_col}{run[-1]}",
+            "values": [rows[row] for row in run]
+        }
 
     def write_headers(self, spreadsheet_id: str, sheet_name: str):
         """Write column headers"""
@@ -139,8 +296,7 @@ class GoogleSheetsClient:
             return
 
         try:
-            spreadsheet = self.client.open_by_key(spreadsheet_id)
-            worksheet = spreadsheet.worksheet(sheet_name)
+            worksheet = self.worksheet(spreadsheet_id, sheet_name)
 
             headers = [
                 ("A1", "SKU"),
@@ -161,3 +317,300 @@ class GoogleSheetsClient:
 
         except Exception as e:
             logger.error(f"Error writing headers: {e}")
+            self.invalidate(spreadsheet_id)
+
+
+_client: Optional[GoogleSheetsClient] = None
+_client_lock = threading.Lock()
+
+
+def get_sheets_client() -> GoogleSheetsClient:
+    """Process-wide client: credentials and handle cache shared by all tasks"""
+    global _client
+    with _client_lock:
+        if _client is None or _client.client is None:
+            _client = GoogleSheetsClient()
+        return _client
+
+
+def _retryable(error: Exception) -> bool:
+    """Quota (429) and transient server/network errors are worth retrying"""
+    if GSPREAD_AVAILABLE and isinstance(error, gspread.exceptions.APIError):
+        return error.code in (429, 500, 502, 503, 504)
+    # requests' ConnectionError/Timeout are OSError subclasses
+    return isinstance(error, OSError)
+
+
+class SheetsQuotaScheduler:
+    """
+    Paces Sheets API calls of one service account to its per-minute quota.
+
+    Reads and writes have separate budgets (sliding one-minute window).
+    Calls over budget wait in line instead of failing; 429/5xx responses
+    are retried with exponential backoff and full jitter.
+    """
+
+    WINDOW = 60.0
+
+    def __init__(
+        self,
+        reads_per_minute: int = 60,
+        writes_per_minute: int = 60,
+        max_retries: int = 8,
+        backoff_base: float = 2.0,
+        backoff_max: float = 64.0
+    ):
+        self.budget = {"read": reads_per_minute, "write": writes_per_minute}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sent = {kind: deque() for kind in self.budget}
+        self._locks = {kind: asyncio.Lock() for kind in self.budget}
+
+        self.queued = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "queue_depth": self.queued,
+            "throttled_seconds": round(self.throttled_seconds, 1),
+            "retries": self.retries,
+            "failures": self.failures,
+            "used": {kind: self._used(kind, now) for kind in self.budget},
+            "budget": dict(self.budget),
+        }
+
+    def _used(self, kind: str, now: float) -> int:
+        sent = self._sent[kind]
+        while sent and sent[0] <= now - self.WINDOW:
+            sent.popleft()
+        return len(sent)
+
+    async def _acquire(self, kind: str):
+        # One waiter per kind at a time keeps callers in FIFO order
+        async with self._locks[kind]:
+            while True:
+                now = time.monotonic()
+                if self._used(kind, now) < self.budget[kind]:
+                    self._sent[kind].append(now)
+                    return
+                wait = self._sent[kind][0] + self.WINDOW - now
+                self.throttled_seconds += wait
+                await asyncio.sleep(wait)
+
+    async def run(self, kind: str, call: Callable[[], Awaitable]):
+        """Run call() within the quota, retrying quota and transient errors"""
+        self.queued += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self._acquire(kind)
+                try:
+                    return await call()
+                except Exception as e:
+                    if not _retryable(e) or attempt == self.max_retries:
+                        self.failures += 1
+                        raise
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                    self.retries += 1
+                    self.throttled_seconds += delay
+                    logger.warning(f"Sheets {kind} failed ({e}), retry {attempt + 1} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            self.queued -= 1
+
+
+class AsyncGoogleSheetsClient:
+    """
+    asyncio front-end for GoogleSheetsClient with the same methods.
+
+    gspread is blocking, so every call runs on a dedicated thread pool and
+    the event loop keeps serving health checks, status polls and page loads
+    while a Sheets request is in flight. Calls go through the account's
+    SheetsQuotaScheduler, so hitting the quota delays rows instead of
+    losing them.
+    """
+
+    def __init__(
+        self,
+        client: Optional[GoogleSheetsClient] = None,
+        max_workers: int = 4,
+        scheduler: Optional[SheetsQuotaScheduler] = None
+    ):
+        self.sync = client or get_sheets_client()
+        self.scheduler = scheduler or SheetsQuotaScheduler()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets")
+
+    @property
+    def client(self):
+        return self.sync.client
+
+    row_values = staticmethod(GoogleSheetsClient.row_values)
+
+    async def _run(self, fn: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    async def _call(self, kind: str, fn: Callable, *args):
+        return await self.scheduler.run(kind, lambda: self._run(fn, *args))
+
+    async def read_skus(self, spreadsheet_id: str, sheet_name: str, column: str = "A", start_row: int = 2) -> List[str]:
+        return [sku for _, sku in await self.read_sku_rows(spreadsheet_id, sheet_name, column, start_row)]
+
+    async def read_sku_rows(
+        self, spreadsheet_id: str, sheet_name: str, column: str = "A", start_row: int = 2
+    ) -> List[Tuple[int, str]]:
+        if not self.client:
+            logger.error("Google Sheets client not initialized")
+            return []
+
+        try:
+            return await self._call("read", self.sync.fetch_sku_rows, spreadsheet_id, sheet_name, column, start_row)
+        except Exception as e:
+            logger.error(f"Error reading SKUs: {e}")
+            self.sync.invalidate(spreadsheet_id)
+            return []
+
+    async def read_sku_entries(
+        self, spreadsheet_id: str, sheet_name: str, column: str = "A", start_row: int = 2
+    ) -> List[Tuple[int, str, str, str]]:
+        if not self.client:
+            logger.error("Google Sheets client not initialized")
+            return []
+
+        try:
+            return await self._call("read", self.sync.fetch_sku_entries, spreadsheet_id, sheet_name, column, start_row)
+        except Exception as e:
+            logger.error(f"Error reading SKUs: {e}")
+            self.sync.invalidate(spreadsheet_id)
+            return []
+
+    async def write_result(self, spreadsheet_id: str, sheet_name: str, row: int, result: Dict):
+        await self.write_rows(spreadsheet_id, sheet_name, {row: self.row_values(result)})
+
+    async def write_rows(self, spreadsheet_id: str, sheet_name: str, rows: Dict[int, List]) -> bool:
+        if not self.client:
+            logger.error("Google Sheets client not initialized")
+            return False
+
+        try:
+            await self._call("write", self.sync.put_rows, spreadsheet_id, sheet_name, rows)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing rows {min(rows)}-{max(rows)}: {e}")
+            self.sync.invalidate(spreadsheet_id)
+            return False
+
+    async def write_headers(self, spreadsheet_id: str, sheet_name: str):
+        await self._call("write", self.sync.write_headers, spreadsheet_id, sheet_name)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_async_client: Optional[AsyncGoogleSheetsClient] = None
+
+
+def get_async_sheets_client() -> AsyncGoogleSheetsClient:
+    """Process-wide async client (one service account, one quota scheduler)"""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncGoogleSheetsClient(scheduler=SheetsQuotaScheduler(
+            reads_per_minute=int(os.environ.get("SHEETS_READS_PER_MINUTE", "60")),
+            writes_per_minute=int(os.environ.get("SHEETS_WRITES_PER_MINUTE", "60")),
+            max_retries=int(os.environ.get("SHEETS_MAX_RETRIES", "8"))
+        ))
+    elif _async_client.client is None:
+        _async_client.sync = get_sheets_client()
+    return _async_client
+
+
+def close_sheets_clients():
+    global _async_client
+    if _async_client:
+        _async_client.close()
+        _async_client = None
+
+
+class SheetWriteBuffer:
+    """
+    Collects results for one sheet and writes them in coalesced blocks.
+
+    A flush starts in the background when flush_rows results are buffered
+    or flush_interval seconds have passed since the last flush, so the
+    write overlaps with parsing the next rows. flush_periodically() keeps
+    the interval honest while no results arrive (breaker cooldowns, slow
+    pages); close() writes the rest at task end. on_written gets the rows that actually reached the sheet, so
+    the caller can mark them done; rows from a failed flush stay buffered
+    for the next attempt.
+    """
+
+    def __init__(
+        self,
+        client: AsyncGoogleSheetsClient,
+        spreadsheet_id: str,
+        sheet_name: str,
+        flush_rows: int = 20,
+        flush_interval: float = 15.0,
+        on_written: Optional[Callable[[List[Tuple[int, Dict]]], None]] = None
+    ):
+        self.client = client
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.on_written = on_written
+        self._pending: Dict[int, Dict] = {}
+        self._last_flush = time.monotonic()
+        self._flushing: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, row: int, result: Dict):
+        """Buffer a result; starts a background flush when one is due"""
+        self._pending[row] = result
+        self._maybe_flush()
+
+    async def flush_periodically(self):
+        """Start due flushes between results; run as a task and cancel it at task end"""
+        while True:
+            await asyncio.sleep(max(self._last_flush + self.flush_interval - time.monotonic(), 1.0))
+            self._maybe_flush()
+
+    def _maybe_flush(self):
+        if not self._pending or (self._flushing and not self._flushing.done()):
+            return
+        if (len(self._pending) >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self._flushing = asyncio.create_task(self.flush())
+
+    async def flush(self) -> List[Tuple[int, Dict]]:
+        batch = dict(self._pending)
+        if not batch:
+            return []
+
+        self._last_flush = time.monotonic()
+        rows = {row: self.client.row_values(result) for row, result in batch.items()}
+        if not await self.client.write_rows(self.spreadsheet_id, self.sheet_name, rows):
+            return []
+
+        # Rows re-added while the write was in flight stay pending
+        for row, result in batch.items():
+            if self._pending.get(row) is result:
+                del self._pending[row]
+
+        flushed = sorted(batch.items())
+        logger.debug(f"Flushed {len(flushed)} rows to {self.sheet_name}")
+        if self.on_written:
+            self.on_written(flushed)
+        return flushed
+
+    async def close(self):
+        """Wait for a background flush and write out everything still buffered"""
+        if self._flushing:
+            await self._flushing
+            self._flushing = None
+        await self.flush()
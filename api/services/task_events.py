@@ -0,0 +1,60 @@
+"""
+Task Events
+In-process fan-out of parse task progress to stream subscribers
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional, Set
+from loguru import logger
+
+
+class ThroughputMeter:
+    """Measured SKU/s for the current run and the ETA derived from it"""
+
+    def __init__(self, total: int, already_done: int = 0):
+        self.total = total
+        self.already_done = already_done
+        self.started = time.monotonic()
+
+    def eta(self, processed: int) -> Dict:
+        elapsed = time.monotonic() - self.started
+        done_now = processed - self.already_done
+        rate = done_now / elapsed if elapsed > 0 and done_now > 0 else 0.0
+        remaining = max(self.total - processed, 0)
+        return {
+            "rate_per_min": round(rate * 60, 2),
+            "eta_seconds": round(remaining / rate) if rate else None,
+        }
+
+
+class TaskEventHub:
+    """
+    Per-task subscriber queues.
+
+    Publishing never blocks the parser: a subscriber that falls behind by
+    more than max_queue events loses its oldest events.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(task_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[task_id]
+
+    def publish(self, task_id: str, event: str, data: Optional[Dict] = None):
+        for queue in self._subscribers.get(task_id, ()):
+            if queue.full():
+                queue.get_nowait()
+                logger.debug(f"Task {task_id}: slow stream subscriber, dropped an event")
+            queue.put_nowait((event, data or {}))
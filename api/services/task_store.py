@@ -0,0 +1,145 @@
+"""
+Task Store
+Durable storage for /api/parse tasks and their per-row progress
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from loguru import logger
+
+
+class SqliteTaskStore:
+    """
+    SQLite-backed task store.
+
+    Keeps the task record (status and counters) plus one row per processed
+    sheet row, so an interrupted task can resume from the first row that
+    has not been written yet.
+    """
+
+    # Task statuses that are resumed on startup
+    UNFINISHED = ("pending", "running")
+
+    def __init__(self, path: str = "data/tasks.db"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                spreadsheet_id TEXT NOT NULL,
+                sheet_name TEXT NOT NULL,
+                column_sku TEXT NOT NULL,
+                start_row INTEGER NOT NULL,
+                max_age_hours REAL NOT NULL DEFAULT 0,
+                weight REAL NOT NULL DEFAULT 1,
+                idempotency_key TEXT,
+                status TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '0/0',
+                total INTEGER NOT NULL DEFAULT 0,
+                processed INTEGER NOT NULL DEFAULT 0,
+                errors INTEGER NOT NULL DEFAULT 0,
+                started_at TEXT,
+                completed_at TEXT,
+                updated_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS task_rows (
+                task_id TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                sku TEXT NOT NULL,
+                error TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (task_id, row)
+            );
+        """)
+        self._migrate()
+        self._db.commit()
+        logger.info(f"Task store: {path}")
+
+    def _migrate(self):
+        """Add columns introduced after the table was first created"""
+        columns = {r["name"] for r in self._db.execute("PRAGMA table_info(tasks)")}
+        if "max_age_hours" not in columns:
+            self._db.execute("ALTER TABLE tasks ADD COLUMN max_age_hours REAL NOT NULL DEFAULT 0")
+        if "idempotency_key" not in columns:
+            self._db.execute("ALTER TABLE tasks ADD COLUMN idempotency_key TEXT")
+        if "weight" not in columns:
+            self._db.execute("ALTER TABLE tasks ADD COLUMN weight REAL NOT NULL DEFAULT 1")
+        self._db.execute("CREATE INDEX IF NOT EXISTS tasks_idempotency_key ON tasks (idempotency_key, status)")
+
+    def create(
+        self,
+        task_id: str,
+        spreadsheet_id: str,
+        sheet_name: str,
+        column_sku: str,
+        start_row: int,
+        max_age_hours: float = 0,
+        idempotency_key: Optional[str] = None,
+        weight: float = 1.0
+    ) -> Dict:
+        now = datetime.utcnow().isoformat()
+        self._db.execute(
+            """INSERT INTO tasks (task_id, spreadsheet_id, sheet_name, column_sku, start_row,
+                                  max_age_hours, weight, idempotency_key, status, started_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)""",
+            (task_id, spreadsheet_id, sheet_name, column_sku, start_row, max_age_hours, weight,
+             idempotency_key, now, now)
+        )
+        self._db.commit()
+        return self.get(task_id)
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        row = self._db.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find_unfinished(self, idempotency_key: str) -> Optional[Dict]:
+        """Pending/running task created with this idempotency key"""
+        row = self._db.execute(
+            f"SELECT * FROM tasks WHERE idempotency_key = ? AND status IN ({', '.join('?' * len(self.UNFINISHED))}) "
+            "ORDER BY started_at DESC LIMIT 1",
+            (idempotency_key, *self.UNFINISHED)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def update(self, task_id: str, **fields):
+        if not fields:
+            return
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._db.execute(
+            f"UPDATE tasks SET {columns} WHERE task_id = ?",
+            (*fields.values(), task_id)
+        )
+        self._db.commit()
+
+    def mark_row(self, task_id: str, row: int, sku: str, error: str = ""):
+        """Record a sheet row as processed (written back to the sheet)"""
+        self._db.execute(
+            "INSERT OR REPLACE INTO task_rows (task_id, row, sku, error) VALUES (?, ?, ?, ?)",
+            (task_id, row, sku, error or "")
+        )
+        self._db.commit()
+
+    def done_rows(self, task_id: str) -> Set[int]:
+        rows = self._db.execute("SELECT row FROM task_rows WHERE task_id = ?", (task_id,))
+        return {r["row"] for r in rows}
+
+    def error_rows(self, task_id: str) -> Set[int]:
+        rows = self._db.execute("SELECT row FROM task_rows WHERE task_id = ? AND error != ''", (task_id,))
+        return {r["row"] for r in rows}
+
+    def unfinished(self) -> List[Dict]:
+        rows = self._db.execute(
+            f"SELECT * FROM tasks WHERE status IN ({', '.join('?' * len(self.UNFINISHED))}) ORDER BY started_at",
+            self.UNFINISHED
+        )
+        return [dict(r) for r in rows]
+
+    def close(self):
+        self._db.close()
@@ -8,25 +8,45 @@ Ozon Parser API Server
 
 Endpoints:
   GET  /health           - проверка работоспособности
-  GET  /parse/{sku}      - парсинг одного SKU
-  POST /parse/batch      - парсинг списка SKU
+  GET  /parse/{sku}      - парсинг одного SKU (кэш PARSER_CACHE_TTL сек, ?fresh=true - мимо кэша)
+  POST /parse/batch      - парсинг списка SKU (до 50)
+  POST /parse/stream     - NDJSON/CSV со SKU любого размера -> NDJSON по мере готовности (gzip, keepalive)
+  GET  /cache            - счётчики кэша
 """
 
 import asyncio
+import csv
+import json
+import os
+import zlib
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, List, Optional
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from auto_parser import OzonParser
+from result_cache import ResultCache
 
 
 # Глобальный инстанс парсера (singleton)
 parser_instance: Optional[OzonParser] = None
 parser_lock = asyncio.Lock()
+# Одна вкладка браузера: запросы парсинга идут по очереди, перезапуск - между ними
+page_lock = asyncio.Lock()
+
+# Кэш результатов: повторные запросы SKU в течение TTL не грузят страницу
+result_cache = ResultCache(
+    ttl=float(os.environ.get("PARSER_CACHE_TTL", "600")),
+    db_path=os.environ.get("PARSER_CACHE_DB") or None
+)
+
+# /parse/stream: строка {"keepalive": true}, если результата нет столько секунд
+# (пауза circuit breaker или долгая загрузка), чтобы туннель не закрыл тихое соединение
+STREAM_KEEPALIVE = float(os.environ.get("PARSER_STREAM_KEEPALIVE", "15"))
 
 
 class ParseResult(BaseModel):
@@ -56,16 +76,55 @@ class BatchResponse(BaseModel):
 class HealthResponse(BaseModel):
     status: str
     browser_active: bool
+    circuit: Optional[dict] = None
     timestamp: str
 
 
+def new_parser() -> OzonParser:
+    """Парсер с автоперезапуском браузера (PARSER_RECYCLE_BROWSER_AFTER / PARSER_MAX_BROWSER_RSS_MB)"""
+    return OzonParser(
+        headless=True,
+        delay=2.0,
+        recycle_after=int(os.environ.get("PARSER_RECYCLE_BROWSER_AFTER", "300")),
+        max_rss_mb=float(os.environ.get("PARSER_MAX_BROWSER_RSS_MB", "0"))
+    )
+
+
+def to_parse_result(result: dict) -> ParseResult:
+    return ParseResult(
+        sku=result["sku"],
+        name=result.get("name"),
+        price=result.get("price"),
+        currency=result.get("currency", "RUB"),
+        brand=result.get("brand"),
+        rating=result.get("rating"),
+        reviews=result.get("reviews"),
+        availability=result.get("availability"),
+        error=result.get("error") if result.get("error") else None,
+        parsed_at=result.get("parsed_at", datetime.now().isoformat())
+    )
+
+
+async def parse_one(parser: OzonParser, sku: str) -> dict:
+    """
+    Парсинг одного SKU на общей вкладке + перезапуск браузера при необходимости.
+    Темп общий для всех запросов к серверу: parser.pacer (AIMD).
+    """
+    async with page_lock:
+        await parser.pacer.acquire()
+        result = await parser.parse_product(sku)
+        parser.pacer.observe(result)
+        await parser.maybe_recycle()
+        return result
+
+
 async def get_parser() -> OzonParser:
     """Получить или создать инстанс парсера"""
     global parser_instance
 
     async with parser_lock:
         if parser_instance is None:
-            parser_instance = OzonParser(headless=True, delay=2.0)
+            parser_instance = new_parser()
             await parser_instance.start()
             print("[API] Браузер инициализирован")
         return parser_instance
@@ -85,6 +144,7 @@ async def lifespan(app: FastAPI):
     """Lifecycle: запуск и остановка парсера"""
     yield
     await shutdown_parser()
+    result_cache.close()
 
 
 # FastAPI приложение
@@ -111,29 +171,22 @@ async def health_check():
     return HealthResponse(
         status="ok",
         browser_active=parser_instance is not None,
+        circuit=parser_instance.breaker.stats() if parser_instance else None,
         timestamp=datetime.now().isoformat()
     )
 
 
 @app.get("/parse/{sku}", response_model=ParseResult)
-async def parse_single(sku: str):
+async def parse_single(sku: str, fresh: bool = False):
     """Парсинг одного товара по SKU"""
     try:
         parser = await get_parser()
-        result = await parser.parse_product(sku)
+        if fresh:
+            result = await parse_one(parser, sku)
+        else:
+            result = await result_cache.get_or_fetch(sku, lambda: parse_one(parser, sku))
 
-        return ParseResult(
-            sku=result["sku"],
-            name=result.get("name"),
-            price=result.get("price"),
-            currency=result.get("currency", "RUB"),
-            brand=result.get("brand"),
-            rating=result.get("rating"),
-            reviews=result.get("reviews"),
-            availability=result.get("availability"),
-            error=result.get("error") if result.get("error") else None,
-            parsed_at=result.get("parsed_at", datetime.now().isoformat())
-        )
+        return to_parse_result(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -145,30 +198,19 @@ async def parse_batch(request: BatchRequest):
         raise HTTPException(status_code=400, detail="Список SKU пуст")
 
     if len(request.skus) > 50:
-        raise HTTPException(status_code=400, detail="Максимум 50 SKU за запрос")
+        raise HTTPException(status_code=400, detail="Максимум 50 SKU за запрос, для больших списков - POST /parse/stream")
 
     try:
         parser = await get_parser()
-        results = await parser.parse_batch(request.skus)
+        async with page_lock:
+            results = await parser.parse_batch(request.skus)
 
         parsed_results = []
         successful = 0
         failed = 0
 
         for r in results:
-            parsed = ParseResult(
-                sku=r["sku"],
-                name=r.get("name"),
-                price=r.get("price"),
-                currency=r.get("currency", "RUB"),
-                brand=r.get("brand"),
-                rating=r.get("rating"),
-                reviews=r.get("reviews"),
-                availability=r.get("availability"),
-                error=r.get("error") if r.get("error") else None,
-                parsed_at=r.get("parsed_at", datetime.now().isoformat())
-            )
-            parsed_results.append(parsed)
+            parsed_results.append(to_parse_result(r))
 
             if r.get("error"):
                 failed += 1
@@ -185,17 +227,124 @@ async def parse_batch(request: BatchRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def read_upload_skus(request: Request) -> List[str]:
+    """
+    SKU из тела запроса, читаем потоком по строкам.
+    NDJSON: {"sku": "123"} или "123" в строке; CSV/текст: первая колонка,
+    строки без цифр (заголовок) пропускаются.
+    """
+    ndjson = "json" in request.headers.get("content-type", "")
+    skus = []
+    tail = ""
+
+    def take(line: str):
+        line = line.strip()
+        if not line:
+            return
+        if ndjson:
+            item = json.loads(line)
+            sku = str(item.get("sku", "") if isinstance(item, dict) else item).strip()
+        else:
+            sku = next(csv.reader([line]))[0].strip()
+        if sku.isdigit():
+            skus.append(sku)
+
+    async for chunk in request.stream():
+        tail += chunk.decode("utf-8", errors="ignore")
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            take(line)
+    take(tail)
+    return skus
+
+
+async def stream_results(skus: List[str], fresh: bool) -> AsyncIterator[bytes]:
+    """Одна NDJSON-строка на SKU сразу после парсинга, keepalive-строки в паузах, в конце - итог"""
+    parser = await get_parser()
+    successful = failed = 0
+
+    async def fetch(sku: str) -> dict:
+        try:
+            if fresh:
+                return await parse_one(parser, sku)
+            return await result_cache.get_or_fetch(sku, lambda: parse_one(parser, sku))
+        except Exception as e:
+            return {"sku": sku, "error": str(e), "parsed_at": datetime.now().isoformat()}
+
+    for sku in skus:
+        task = asyncio.create_task(fetch(sku))
+        try:
+            while True:
+                try:
+                    result = await asyncio.wait_for(asyncio.shield(task), STREAM_KEEPALIVE)
+                    break
+                except asyncio.TimeoutError:
+                    yield (json.dumps({"keepalive": True}) + "\n").encode()
+        finally:
+            # Клиент отключился - парсинг SKU больше никому не нужен
+            task.cancel()
+
+        if result.get("error"):
+            failed += 1
+        else:
+            successful += 1
+        # Паузу между загрузками выдерживает parse_one, из кэша - без паузы
+        yield (to_parse_result(result).model_dump_json() + "\n").encode()
+
+    yield (json.dumps({"done": True, "total": len(skus), "successful": successful, "failed": failed}) + "\n").encode()
+
+
+async def gzip_lines(lines: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """gzip со сбросом после каждой строки - клиент видит результаты сразу"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for line in lines:
+        yield compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+@app.post("/parse/stream")
+async def parse_stream(request: Request, fresh: bool = False):
+    """
+    Парсинг списка SKU любого размера без таймаута туннеля.
+
+    Тело: NDJSON (Content-Type: application/x-ndjson) или CSV/текст со SKU
+    в первой колонке. Ответ: NDJSON, строка на SKU по мере готовности,
+    пока SKU парсится дольше PARSER_STREAM_KEEPALIVE сек - строки {"keepalive": true},
+    последняя строка - {"done": true, ...}. При Accept-Encoding: gzip ответ сжат.
+    """
+    try:
+        skus = await read_upload_skus(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Не удалось разобрать тело: {e}")
+    if not skus:
+        raise HTTPException(status_code=400, detail="Список SKU пуст")
+
+    body = stream_results(skus, fresh)
+    headers = {"X-Total-Skus": str(len(skus)), "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip_lines(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+
+@app.get("/cache")
+async def cache_stats():
+    """Счётчики кэша результатов (hits/misses/coalesced)"""
+    return result_cache.stats()
+
+
 @app.post("/restart")
 async def restart_browser():
     """Перезапуск браузера (если завис)"""
     global parser_instance
 
-    async with parser_lock:
+    async with parser_lock, page_lock:
         if parser_instance:
             await parser_instance.close()
             parser_instance = None
 
-        parser_instance = OzonParser(headless=True, delay=2.0)
+        parser_instance = new_parser()
         await parser_instance.start()
 
     return {"status": "restarted"}
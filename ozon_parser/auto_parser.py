@@ -7,20 +7,22 @@
   python auto_parser.py                           # Использует конфиг по умолчанию
   python auto_parser.py --sheet "ID_таблицы"
   python auto_parser.py --csv input.csv --output results.csv
+  python auto_parser.py --csv input.csv --output results.csv --resume   # продолжить после падения
 
 ВАЖНО: Запускать на ДОМАШНЕМ ПК, не на VPS (Ozon блокирует датацентры)
 """
 
 import asyncio
 import argparse
-import csv
-import json
-import random
+import concurrent.futures
+import itertools
+import multiprocessing
+from queue import Empty
 import sys
-import os
 from datetime import datetime
+from collections import Counter
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple, Iterable, Iterator, Sized
 
 try:
     from playwright.async_api import async_playwright, Browser, Page
@@ -42,29 +44,58 @@ except ImportError:
     GSHEETS_AVAILABLE = False
     print("[WARN] gspread не установлен, Google Sheets недоступен")
 
+from resource_blocker import ResourceBlocker, PROFILES
+from page_ready import wait_until_ready, PRODUCT_READY
+from page_probe import probe_page
+from http_engine import HttpEngine
+from browser_memory import descendants_rss_mb
+from sheet_diff import write_diff
+from pacing import AimdPacer
+from circuit_breaker import CircuitBreaker, is_blocked
+from csv_sink import CsvSink, failed_result, iter_skus, read_results
+
 # Конфигурация по умолчанию
 DEFAULT_SHEET_ID = "1la2mK1DpL6KvnQ5t4oRDvUietTMhgS2ZWfNnS1H4EgQ"
 DEFAULT_CREDS_PATH = Path(__file__).parent.parent / "credentials" / "service-account.json"
 
+# В режиме вкладок перезапуск браузера проверяется между порциями по столько SKU
+TABS_CHUNK = 50
+
 
 class OzonParser:
     """Парсер цен конкурентов с Ozon через JSON-LD Schema"""
 
-    def __init__(self, headless: bool = False, delay: float = 2.5):
+    def __init__(self, headless: bool = False, delay: float = 2.5, resources: str = "jsonld-only",
+                 http_first: bool = True, recycle_after: int = 300, max_rss_mb: float = 0,
+                 profile_dir: Optional[Path] = None, min_delay: float = 1.0, max_delay: float = 60.0):
         self.headless = headless  # False = видишь браузер, True = фоновый режим
-        self.delay = delay  # Задержка между запросами (сек)
+        self.delay = delay  # Стартовая пауза между запросами (сек)
+        # Пауза подстраивается в [min_delay, max_delay] по 429/5xx/таймаутам/антиботу
+        self.pacer = AimdPacer(delay, min_delay, max_delay)
+        # Общий на все вкладки: пауза всей навигации при волне блокировок
+        self.breaker = CircuitBreaker()
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
+        self.blocker = ResourceBlocker(resources)  # Блокировка картинок/шрифтов/трекеров
+        self.http_first = http_first  # Сначала пробуем без браузера
+        self.http: Optional[HttpEngine] = None
+        # Перезапуск браузера после N страниц или при RSS > max_rss_mb (0 = выкл)
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self.navigations = 0
+        self.restarts = 0
+        # Вкладки для parse_batch(tabs=K): (страница, блокировщик); [0] - self.page
+        self.tabs: List[Tuple[Page, ResourceBlocker]] = []
+        # Профиль Chrome (с пройденным антиботом); у каждого --workers процесса свой
+        self.profile_dir = profile_dir or Path.home() / "OzonParserProfile"
 
     async def start(self):
         """Запуск браузера"""
         self._playwright = await async_playwright().start()
 
         # Используем существующий профиль Chrome (с пройденным антиботом)
-        user_data_dir = Path.home() / "OzonParserProfile"
-
         self.browser = await self._playwright.chromium.launch_persistent_context(
-            user_data_dir=str(user_data_dir),
+            user_data_dir=str(self.profile_dir),
             headless=self.headless,
             locale="ru-RU",  # Русская локаль для Ozon
             timezone_id="Europe/Moscow",
@@ -77,31 +108,89 @@ class OzonParser:
             ]
         )
         self.page = await self.browser.new_page()
+        await self._prepare_page(self.page, self.blocker)
+        self.tabs = [(self.page, self.blocker)]
+        if STEALTH_AVAILABLE:
+            print("[OK] Stealth mode активирован")
 
+        print(f"[OK] Браузер запущен (headless={self.headless}, ресурсы={self.blocker.profile})")
+
+        if self.http_first:
+            # Тот же User-Agent и куки профиля - для Ozon это тот же "браузер"
+            user_agent = await self.page.evaluate("navigator.userAgent")
+            self.http = HttpEngine(user_agent)
+            await self.http.start()
+            self.http.set_cookies(await self.browser.cookies())
+
+    async def _prepare_page(self, page: Page, blocker: ResourceBlocker):
+        """Stealth, маскировка автоматизации и блокировка ресурсов для вкладки"""
         # Применяем stealth если доступен
         if STEALTH_AVAILABLE:
-            stealth = Stealth()
-            await stealth.apply_stealth_async(self.page)
-            print("[OK] Stealth mode активирован")
+            await Stealth().apply_stealth_async(page)
 
         # Маскировка автоматизации
-        await self.page.add_init_script("""
+        await page.add_init_script("""
             Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
             Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
             Object.defineProperty(navigator, 'languages', {get: () => ['ru-RU', 'ru', 'en-US', 'en']});
         """)
 
-        print(f"[OK] Браузер запущен (headless={self.headless})")
+        await blocker.attach(page)
+
+    async def open_tabs(self, count: int):
+        """Довести число вкладок до count (тот же профиль, те же куки)"""
+        while len(self.tabs) < count:
+            page = await self.browser.new_page()
+            blocker = ResourceBlocker(self.blocker.profile)
+            await self._prepare_page(page, blocker)
+            self.tabs.append((page, blocker))
 
     async def close(self):
         """Закрытие браузера"""
+        self.tabs = []
+        if self.http:
+            await self.http.close()
+            self.http = None
         if self.browser:
             await self.browser.close()
+            self.browser = None
         if hasattr(self, '_playwright') and self._playwright:
             await self._playwright.stop()
+            self._playwright = None
+
+    async def maybe_recycle(self) -> bool:
+        """
+        Перезапуск браузера между SKU, чтобы память не росла:
+        после recycle_after страниц или когда RSS браузера > max_rss_mb.
+        Профиль на диске, так что куки и пройденный антибот сохраняются.
+        """
+        reason = None
+        if self.recycle_after and self.navigations >= self.recycle_after:
+            reason = f"{self.navigations} страниц"
+        elif self.max_rss_mb:
+            rss = descendants_rss_mb()
+            if rss and rss > self.max_rss_mb:
+                reason = f"RSS {rss:.0f} МБ > {self.max_rss_mb:.0f} МБ"
+
+        if not reason:
+            return False
+
+        print(f"\n[RECYCLE] Перезапуск браузера ({reason})")
+        await self.close()
+        await self.start()
+        self.navigations = 0
+        self.restarts += 1
+        return True
+
+    async def parse_product(self, sku: str, tab: Optional[Tuple[Page, ResourceBlocker]] = None) -> Dict:
+        """Парсинг одного товара по SKU (tab - вкладка из self.tabs, по умолчанию основная)"""
+        probe = await self.breaker.acquire()
+        result = await self._load_product(sku, tab)
+        self.breaker.record(is_blocked(result), probe)
+        return result
 
-    async def parse_product(self, sku: str) -> Dict:
-        """Парсинг одного товара по SKU"""
+    async def _load_product(self, sku: str, tab: Optional[Tuple[Page, ResourceBlocker]] = None) -> Dict:
+        page, blocker = tab or (self.page, self.blocker)
         url = f"https://www.ozon.ru/product/{sku}/"
         result = {
             "sku": sku,
@@ -113,105 +202,244 @@ class OzonParser:
             "reviews": 0,
             "availability": "",
             "error": "",
-            "parsed_at": datetime.now().isoformat()
+            "parsed_at": datetime.now().isoformat(),
+            "engine": "",
+            "attempts": []
         }
 
-        try:
-            await self.page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            await asyncio.sleep(2)  # Ждём загрузку
-
-            # Проверяем антибот
-            title = await self.page.title()
-            if "Antibot" in title or "Challenge" in title:
-                print(f"  [!] Antibot detected, waiting 5s...")
-                await asyncio.sleep(5)
-
-            # Извлекаем JSON-LD
-            jsonld_data = await self.page.evaluate("""
-                () => {
-                    const script = document.querySelector('script[type="application/ld+json"]');
-                    if (!script) return null;
-                    try {
-                        return JSON.parse(script.textContent);
-                    } catch(e) {
-                        return null;
-                    }
-                }
-            """)
+        # 1. Без браузера: у большинства карточек JSON-LD уже в исходном HTML
+        if self.http and self.http.available:
+            jsonld_data, reason = await self.http.fetch_jsonld(url)
+            result["attempts"].append({"engine": "http", "error": reason or ""})
+            if jsonld_data or reason == "HTTP 404":
+                result["engine"] = "http"
+                if reason:
+                    result["error"] = reason
+                else:
+                    self._apply_jsonld(jsonld_data, result)
+                return result
+
+        # 2. Браузер
+        result["engine"] = "browser"
+        blocker.reset()
+        self.navigations += 1
 
-            if jsonld_data:
-                result["name"] = jsonld_data.get("name", "")
-                result["brand"] = jsonld_data.get("brand", {})
-                if isinstance(result["brand"], dict):
-                    result["brand"] = result["brand"].get("name", "")
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+            # Ждём JSON-LD (или антибот), максимум 10 сек
+            result["ready_ms"] = await wait_until_ready(page, PRODUCT_READY)
 
-                offers = jsonld_data.get("offers", {})
-                result["price"] = float(offers.get("price", 0))
-                result["currency"] = offers.get("priceCurrency", "RUB")
+            # Заголовок, антибот и JSON-LD за один запрос
+            probe = await probe_page(page)
+            if probe["block"]:
+                print(f"  [!] Antibot detected, waiting up to 5s...")
+                result["ready_ms"] = await wait_until_ready(page, PRODUCT_READY, 5, stop_on_block=False)
+                probe = await probe_page(page)
+                result["blocked"] = bool(probe["block"])
 
-                availability = offers.get("availability", "")
-                result["availability"] = "В наличии" if "InStock" in availability else "Нет в наличии"
+            jsonld_data = probe["jsonld"]
 
-                rating = jsonld_data.get("aggregateRating", {})
-                result["rating"] = float(rating.get("ratingValue", 0))
-                result["reviews"] = int(rating.get("reviewCount", 0))
+            if jsonld_data:
+                self._apply_jsonld(jsonld_data, result)
+                # Браузер прошёл - обновляем куки HTTP-движка
+                if self.http:
+                    self.http.set_cookies(await self.browser.cookies())
             else:
-                result["error"] = "JSON-LD not found"
+                result["error"] = "Product not found" if probe["notFound"] else "JSON-LD not found"
 
         except Exception as e:
             result["error"] = str(e)[:100]
 
+        result["traffic"] = blocker.stats()
+        result["attempts"].append({"engine": "browser", "error": result["error"]})
         return result
 
-    async def parse_batch(self, skus: List[str], progress_callback=None) -> List[Dict]:
-        """Парсинг списка SKU"""
+    def _apply_jsonld(self, jsonld_data: Dict, result: Dict):
+        """Заполнение результата из Product JSON-LD"""
+        try:
+            result["name"] = jsonld_data.get("name", "")
+            result["brand"] = jsonld_data.get("brand", {})
+            if isinstance(result["brand"], dict):
+                result["brand"] = result["brand"].get("name", "")
+
+            offers = jsonld_data.get("offers", {})
+            result["price"] = float(offers.get("price", 0))
+            result["currency"] = offers.get("priceCurrency", "RUB")
+
+            availability = offers.get("availability", "")
+            result["availability"] = "В наличии" if "InStock" in availability else "Нет в наличии"
+
+            rating = jsonld_data.get("aggregateRating", {})
+            result["rating"] = float(rating.get("ratingValue", 0))
+            result["reviews"] = int(rating.get("reviewCount", 0))
+        except Exception as e:
+            result["error"] = str(e)[:100]
+
+    @staticmethod
+    def _result_line(result: Dict) -> str:
+        if result["error"]:
+            return f"ОШИБКА: {result['error']}"
+        return f"{result['price']} {result['currency']} | {result['rating']}★ | {result['reviews']} отзывов [{result['engine']}]"
+
+    async def parse_batch(self, skus: Iterable[str], progress_callback=None, tabs: int = 1,
+                          keep_results: bool = True) -> List[Dict]:
+        """
+        Парсинг списка SKU (tabs > 1 - параллельно в нескольких вкладках).
+
+        skus может быть генератором (iter_skus) - тогда всего SKU заранее
+        неизвестно. keep_results=False не копит результаты в памяти: их
+        забирает progress_callback (например, CsvSink.write).
+        """
+        total = len(skus) if isinstance(skus, Sized) else None
+        if tabs > 1:
+            return await self._parse_batch_tabs(iter(skus), tabs, total, progress_callback, keep_results)
+
         results = []
-        total = len(skus)
 
         for i, sku in enumerate(skus, 1):
-            print(f"[{i}/{total}] Парсинг SKU {sku}...", end=" ")
+            if i > 1:
+                await self.maybe_recycle()
+            # Адаптивная пауза, чтобы не забанили
+            await self.pacer.acquire()
+
+            print(f"[{i}/{total or '?'}] Парсинг SKU {sku}...", end=" ")
 
             result = await self.parse_product(sku)
-            results.append(result)
+            if keep_results:
+                results.append(result)
 
-            if result["error"]:
-                print(f"ОШИБКА: {result['error']}")
-            else:
-                print(f"{result['price']} {result['currency']} | {result['rating']}★ | {result['reviews']} отзывов")
+            print(self._result_line(result))
+            if self.pacer.observe(result):
+                print(f"  [PACE] Перегрузка, {self.pacer}")
 
             if progress_callback:
                 progress_callback(i, total, result)
 
-            # Случайная задержка (2-4 сек) чтобы не забанили
-            if i < total:
-                delay = self.delay + random.uniform(0, 1.5)
-                await asyncio.sleep(delay)
-
         return results
 
+    async def _parse_batch_tabs(self, skus: Iterator[str], tabs: int, total: Optional[int],
+                                progress_callback=None, keep_results: bool = True) -> List[Dict]:
+        """
+        K вкладок одного профиля берут SKU из общей очереди. Общий self.pacer
+        держит суммарный темп: загрузки страниц перекрываются, а Ozon видит
+        ту же частоту запросов, что и в последовательном режиме.
+        SKU берутся из skus порциями по TABS_CHUNK, между порциями - перезапуск
+        браузера при необходимости.
+        """
+        results: List[Dict] = []
+        done = 0
+
+        async def tab_worker(tab, queue: asyncio.Queue, chunk: List[Optional[Dict]]):
+            nonlocal done
+            while True:
+                try:
+                    i, sku = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self.pacer.acquire()
+                result = await self.parse_product(sku, tab)
+                chunk[i] = result
+                done += 1
+                print(f"[{done}/{total or '?'}] SKU {sku}: {self._result_line(result)}")
+                if self.pacer.observe(result):
+                    print(f"  [PACE] Перегрузка, {self.pacer}")
+                if progress_callback:
+                    progress_callback(done, total, result)
+
+        print(f"[INFO] Вкладок: {tabs}, общий темп ~{self.pacer.rate * 60:.0f} SKU/мин")
+
+        first = True
+        while True:
+            part = list(itertools.islice(skus, TABS_CHUNK))
+            if not part:
+                break
+            if not first:
+                await self.maybe_recycle()
+            first = False
+            await self.open_tabs(tabs)
+
+            queue: asyncio.Queue = asyncio.Queue()
+            for i, sku in enumerate(part):
+                queue.put_nowait((i, sku))
+            chunk: List[Optional[Dict]] = [None] * len(part)
+            await asyncio.gather(*(tab_worker(tab, queue, chunk) for tab in self.tabs[:tabs]))
+            if keep_results:
+                results.extend(chunk)
+
+        return results
 
-def read_csv(filepath: str) -> List[str]:
-    """Читает SKU из CSV (первая колонка)"""
-    skus = []
-    with open(filepath, "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        next(reader, None)  # Пропускаем заголовок
-        for row in reader:
-            if row and row[0].strip():
-                skus.append(row[0].strip())
-    return skus
 
+def shard(skus: List[str], index: int, workers: int) -> List[Tuple[int, str]]:
+    """Детерминированная доля списка для процесса index: каждый workers-й SKU (с позицией)"""
+    return [(pos, skus[pos]) for pos in range(index, len(skus), workers)]
 
-def write_csv(filepath: str, results: List[Dict]):
-    """Записывает результаты в CSV"""
-    fieldnames = ["sku", "name", "price", "currency", "brand", "rating", "reviews", "availability", "parsed_at", "error"]
 
-    with open(filepath, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
+def run_shard(index: int, workers: int, skus: List[str], parser_options: Dict, tabs: int, results) -> int:
+    """
+    Тело процесса-воркера: свой профиль ~/OzonParserProfile-{index}, своя доля SKU.
+    Каждый результат сразу уходит в очередь results.
+    """
+    part = shard(skus, index, workers)
 
-    print(f"\n[OK] Результаты сохранены: {filepath}")
+    async def run():
+        ozon = OzonParser(**parser_options, profile_dir=Path.home() / f"OzonParserProfile-{index}")
+        try:
+            await ozon.start()
+            await ozon.parse_batch([sku for _, sku in part], tabs=tabs, keep_results=False,
+                                   progress_callback=lambda i, total, result: results.put(result))
+        finally:
+            await ozon.close()
+
+    print(f"[W{index}] {len(part)} SKU")
+    asyncio.run(run())
+    return len(part)
+
+
+async def parse_sharded(skus: List[str], workers: int, parser_options: Dict, on_result, tabs: int = 1):
+    """
+    --workers N: N процессов (отдельные ядра и профили). Результаты приходят
+    через общую очередь и отдаются в on_result по мере готовности (например,
+    CsvSink.write), а не после завершения всех процессов.
+    """
+    print(f"[INFO] Процессов: {workers}, профили ~/OzonParserProfile-0..{workers - 1}")
+    # У каждого процесса свой темп: паузы в N раз длиннее, чтобы в сумме Ozon видел заданный
+    parser_options = dict(parser_options, delay=parser_options["delay"] * workers,
+                          min_delay=parser_options["min_delay"] * workers,
+                          max_delay=parser_options["max_delay"] * workers)
+    # Сколько раз каждый SKU ещё ждёт результата (в списке могут быть повторы)
+    missing = Counter(skus)
+    loop = asyncio.get_running_loop()
+
+    # spawn - одинаково на Windows и Linux, браузер в родителе не запускается
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, \
+            concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as pool:
+        results = manager.Queue()
+        shards = asyncio.gather(*(
+            loop.run_in_executor(pool, run_shard, i, workers, skus, parser_options, tabs, results)
+            for i in range(workers)
+        ), return_exceptions=True)
+
+        while True:
+            # Процессы проверяются до чтения: пустая очередь после их завершения - точно конец
+            finished = shards.done()
+            try:
+                result = await loop.run_in_executor(None, results.get, True, 0.5)
+            except Empty:
+                if finished:
+                    break
+                continue
+            missing[result["sku"]] -= 1
+            on_result(result)
+
+    for i, part in enumerate(shards.result()):
+        if isinstance(part, BaseException):
+            print(f"[ERROR] Процесс {i} упал: {part}")
+
+    # SKU упавшего процесса остаются в выдаче с ошибкой
+    for sku, count in missing.items():
+        for _ in range(count):
+            on_result(failed_result(sku, "Worker process failed"))
 
 
 class GoogleSheetsClient:
@@ -249,8 +477,9 @@ class GoogleSheetsClient:
         skus = [v.strip() for v in values if v.strip()]
         return skus
 
-    def write_results(self, spreadsheet_id: str, results: List[Dict], sheet_name: str = "Парсинг товаров"):
-        """Записывает результаты в колонки B-I"""
+    def write_results(self, spreadsheet_id: str, results: List[Dict], sheet_name: str = "Парсинг товаров",
+                      full_write: bool = False):
+        """Записывает результаты в колонки B-I (по умолчанию только изменившиеся ячейки)"""
         spreadsheet = self.gc.open_by_key(spreadsheet_id)
 
         try:
@@ -272,6 +501,11 @@ class GoogleSheetsClient:
                 r["error"]
             ])
 
+        if rows and not full_write:
+            changed, total = write_diff(worksheet, rows, start_row=2)
+            print(f"[OK] Google Sheets ({sheet_name}): изменено {changed} из {total} ячеек")
+            return
+
         # Batch update начиная с B2
         if rows:
             start_row = 2
@@ -288,9 +522,23 @@ async def main():
     parser.add_argument("--sheet", default=DEFAULT_SHEET_ID, help="ID Google Sheets таблицы")
     parser.add_argument("--creds", default=str(DEFAULT_CREDS_PATH), help="Файл credentials для Google API")
     parser.add_argument("--headless", action="store_true", help="Фоновый режим (без окна браузера)")
-    parser.add_argument("--delay", type=float, default=2.5, help="Задержка между запросами (сек)")
+    parser.add_argument("--delay", type=float, default=2.5, help="Стартовая пауза между запросами (сек)")
+    parser.add_argument("--min-delay", type=float, default=1.0, help="Минимальная пауза: быстрее не разгоняться (сек)")
+    parser.add_argument("--max-delay", type=float, default=60.0, help="Максимальная пауза при перегрузке (сек)")
     parser.add_argument("--skus", nargs="+", help="SKU через пробел: --skus 123 456 789")
     parser.add_argument("--limit", type=int, default=0, help="Ограничить количество SKU (0 = все)")
+    parser.add_argument("--resources", default="jsonld-only", choices=list(PROFILES),
+                        help="Какие ресурсы грузить: jsonld-only (по умолчанию), search-tiles, full")
+    parser.add_argument("--no-http", action="store_true", help="Не пробовать HTTP-движок, сразу браузер")
+    parser.add_argument("--recycle-after", type=int, default=300, help="Перезапуск браузера каждые N страниц (0 = выкл)")
+    parser.add_argument("--max-rss-mb", type=float, default=0, help="Перезапуск браузера при RSS больше N МБ (0 = выкл)")
+    parser.add_argument("--full-write", action="store_true", help="Переписывать весь блок B:I, а не только изменения")
+    parser.add_argument("--tabs", type=int, default=1, help="Параллельных вкладок (общий адаптивный темп на все)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Процессов, каждый со своим профилем ~/OzonParserProfile-{i} и долей SKU "
+                             "(паузы делятся между процессами: суммарный темп как у одного)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Продолжить --output: пропустить SKU, уже спарсенные без ошибки")
 
     args = parser.parse_args()
 
@@ -300,7 +548,7 @@ async def main():
     print()
 
     # Определяем источник SKU
-    skus = []
+    skus: Iterable[str] = []
     sheets_client = None
     spreadsheet_id = None
 
@@ -309,8 +557,9 @@ async def main():
         print(f"[INFO] SKU из командной строки: {len(skus)} шт")
 
     elif args.csv:
-        skus = read_csv(args.csv)
-        print(f"[INFO] SKU из {args.csv}: {len(skus)} шт")
+        # Файл читается по строке по мере парсинга, а не целиком в память
+        skus = iter_skus(args.csv)
+        print(f"[INFO] SKU из {args.csv} (читаются по мере парсинга)")
 
     else:
         # По умолчанию берём из Google Sheets
@@ -323,46 +572,62 @@ async def main():
         skus = sheets_client.read_skus(spreadsheet_id)
         print(f"[INFO] SKU из Google Sheets: {len(skus)} шт")
 
-    if not skus:
+    if isinstance(skus, list) and not skus:
         print("[ERROR] Список SKU пуст!")
         sys.exit(1)
 
     # Применяем лимит
     if args.limit > 0:
-        skus = skus[:args.limit]
+        skus = skus[:args.limit] if isinstance(skus, list) else itertools.islice(skus, args.limit)
         print(f"[INFO] Ограничено до {args.limit} SKU")
 
-    print(f"\n[START] Начинаем парсинг {len(skus)} товаров...")
-    print(f"[INFO] Задержка между запросами: {args.delay}-{args.delay + 1.5} сек")
+    # Результаты пишутся в CSV сразу после каждого SKU
+    sink = CsvSink(args.output, resume=args.resume)
+    if args.resume:
+        print(f"[INFO] --resume: в {args.output} уже готово {len(sink.done)} SKU, они пропускаются")
+
+    if isinstance(skus, list):
+        pending: Iterable[str] = [sku for sku in skus if sku not in sink.done]
+        print(f"\n[START] Начинаем парсинг {len(pending)} товаров...")
+    else:
+        pending = (sku for sku in skus if sku not in sink.done)
+        print("\n[START] Начинаем парсинг...")
+    print(f"[INFO] Пауза между запросами: старт {args.delay} сек, адаптивно {args.min_delay}-{args.max_delay} сек")
     print()
 
     # Парсим
-    ozon = OzonParser(headless=args.headless, delay=args.delay)
-
-    try:
-        await ozon.start()
-        results = await ozon.parse_batch(skus)
-
-        # Сохраняем результаты
-        if sheets_client and spreadsheet_id:
-            sheets_client.write_results(spreadsheet_id, results)
-
-        write_csv(args.output, results)
-
-        # Статистика
-        successful = [r for r in results if not r["error"]]
-        print(f"\n{'='*50}")
-        print(f"ИТОГО: {len(successful)}/{len(results)} успешно")
-
-        if successful:
-            prices = [r["price"] for r in successful if r["price"] > 0]
-            if prices:
-                print(f"Цены: {min(prices):.0f} - {max(prices):.0f} ₽")
-                print(f"Средняя: {sum(prices)/len(prices):.0f} ₽")
-
-    finally:
-        await ozon.close()
-
+    parser_options = dict(headless=args.headless, delay=args.delay, resources=args.resources,
+                          http_first=not args.no_http, recycle_after=args.recycle_after,
+                          max_rss_mb=args.max_rss_mb, min_delay=args.min_delay, max_delay=args.max_delay)
+
+    with sink:
+        if args.workers > 1:
+            # Процессам нужен весь список для раздачи долей; в CSV - по мере готовности
+            await parse_sharded(list(pending), args.workers, parser_options, sink.write, args.tabs)
+        else:
+            ozon = OzonParser(**parser_options)
+            try:
+                await ozon.start()
+                await ozon.parse_batch(pending, progress_callback=lambda i, total, result: sink.write(result),
+                                       tabs=args.tabs, keep_results=False)
+            finally:
+                await ozon.close()
+
+    print(f"\n[OK] Результаты сохранены: {args.output}")
+
+    # В таблицу - все строки листа: новые результаты и взятые из CSV при --resume
+    if sheets_client and spreadsheet_id:
+        by_sku = read_results(args.output)
+        results = [by_sku.get(sku) or failed_result(sku, "Нет результата") for sku in skus]
+        sheets_client.write_results(spreadsheet_id, results, full_write=args.full_write)
+
+    # Статистика
+    print(f"\n{'='*50}")
+    print(f"ИТОГО: {sink.successful}/{sink.written} успешно")
+
+    if sink.price_avg is not None:
+        print(f"Цены: {sink.price_min:.0f} - {sink.price_max:.0f} ₽")
+        print(f"Средняя: {sink.price_avg:.0f} ₽")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+Память браузера: RSS дочерних процессов текущего Python-процесса
+
+psutil (если установлен) или /proc на Linux.
+"""
+
+import os
+from typing import Dict, Optional
+
+
+def descendants_rss_mb() -> Optional[float]:
+    """
+    Суммарный RSS всех дочерних процессов (браузер и его рендереры), МБ.
+    None - если на этой платформе не измерить (Windows без psutil).
+    """
+    try:
+        import psutil
+        children = psutil.Process().children(recursive=True)
+        total = 0
+        for child in children:
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+    except ImportError:
+        pass
+
+    if not os.path.isdir("/proc"):
+        return None
+
+    # Linux без psutil: строим дерево процессов по /proc/<pid>/stat
+    parents: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            # Поля после "(comm)": state, ppid, ...
+            parents[int(entry)] = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+    tree = {os.getpid()}
+    changed = True
+    while changed:
+        changed = False
+        for pid, ppid in parents.items():
+            if ppid in tree and pid not in tree:
+                tree.add(pid)
+                changed = True
+    tree.discard(os.getpid())
+
+    total_kb = 0
+    for pid in tree:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
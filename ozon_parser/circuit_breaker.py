@@ -0,0 +1,125 @@
+"""
+Предохранитель (circuit breaker) на волну блокировок Ozon
+
+Если большинство последних страниц - антибот/капча или HTTP 429, следующие
+запросы тоже упадут: только тратим время и минуты GitHub Actions.
+Предохранитель размыкается, вся навигация процесса ждёт паузу (cool-down),
+потом проходит один пробный запрос (half-open): успех - работа дальше,
+снова блок - пауза вдвое длиннее.
+
+Копия api/services/circuit_breaker.py для локальных скриптов.
+"""
+
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Страница блокировки или rate limit; "не найден" и таймауты не считаются
+_BLOCK = re.compile(r"antibot|captcha|^HTTP 429\b", re.IGNORECASE)
+
+
+def is_blocked(result: Dict) -> bool:
+    """Упёрлась ли в блокировку хоть одна попытка по этому SKU"""
+    if result.get("blocked") or _BLOCK.search(result.get("error") or ""):
+        return True
+    return any(_BLOCK.search(a.get("error") or "") for a in result.get("attempts", []))
+
+
+class CircuitBreaker:
+    """
+    Размыкается, когда доля блокировок среди последних window результатов
+    достигла threshold (и результатов не меньше min_requests).
+
+    acquire() перед запросом: при замкнутом сразу возвращает False, при
+    разомкнутом ждёт, одного вызывающего пропускает пробным (True).
+    record() после запроса - с исходом.
+    """
+
+    def __init__(self, window: int = 20, min_requests: int = 5, threshold: float = 0.5,
+                 cooldown: float = 120.0, max_cooldown: float = 900.0, probe_timeout: float = 120.0):
+        self.window = window
+        self.min_requests = min_requests
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+
+        self.state = CLOSED
+        self.cooldown = cooldown
+        self.trips = 0
+        self._results: deque = deque(maxlen=window)
+        self._open_until = 0.0
+        self._probe_started = 0.0
+
+    @property
+    def block_rate(self) -> float:
+        return sum(self._results) / len(self._results) if self._results else 0.0
+
+    async def acquire(self) -> bool:
+        while True:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return False
+
+            if self.state == OPEN:
+                if now < self._open_until:
+                    await asyncio.sleep(self._open_until - now)
+                    continue
+                self.state = HALF_OPEN
+                self._probe_started = now
+                print("[CIRCUIT] Пробный запрос после паузы")
+                return True
+
+            # Half-open: ждём пробный запрос; если он пропал - пускаем новый
+            if now - self._probe_started > self.probe_timeout:
+                self._probe_started = now
+                return True
+            await asyncio.sleep(1.0)
+
+    def record(self, blocked: bool, probe: bool = False) -> bool:
+        """Учесть исход запроса; True - предохранитель только что разомкнулся"""
+        if self.state == HALF_OPEN:
+            if not probe:
+                return False  # запрос ушёл до размыкания
+            if blocked:
+                self._open(min(self.cooldown * 2, self.max_cooldown), "пробный запрос заблокирован")
+                return True
+            self.state = CLOSED
+            self.cooldown = self.base_cooldown
+            self._results.clear()
+            print("[CIRCUIT] Пробный запрос прошёл, продолжаем")
+            return False
+
+        if self.state == OPEN:
+            return False
+
+        self._results.append(1 if blocked else 0)
+        if len(self._results) >= self.min_requests and self.block_rate >= self.threshold:
+            self._open(self.cooldown, f"блокировок {self.block_rate:.0%} из {len(self._results)}")
+            return True
+        return False
+
+    def _open(self, cooldown: float, reason: str):
+        self.state = OPEN
+        self.cooldown = cooldown
+        self.trips += 1
+        self._open_until = time.monotonic() + cooldown
+        self._results.clear()
+        print(f"[CIRCUIT] Пауза {cooldown:.0f}с ({reason})")
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "block_rate": round(self.block_rate, 3),
+            "window": len(self._results),
+            "trips": self.trips,
+            "cooldown_seconds": self.cooldown,
+            "reopens_in_seconds": round(max(0.0, self._open_until - time.monotonic()), 1)
+            if self.state == OPEN else 0,
+        }
@@ -11,6 +11,8 @@ from dataclasses import dataclass
 from typing import Optional, List
 from playwright.async_api import async_playwright, Page
 
+from page_ready import wait_until_ready, PRODUCT_READY, SEARCH_READY
+
 @dataclass
 class ProductData:
     sku: str
@@ -78,7 +80,8 @@ class OzonCompetitorParser:
         page = await self.context.new_page()
         try:
             await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            await page.wait_for_timeout(2000)  # Ждём загрузки данных
+            ready_ms = await wait_until_ready(page, PRODUCT_READY)  # Ждём JSON-LD
+            print(f"  готово за {ready_ms} мс" if ready_ms is not None else "  таймаут ожидания JSON-LD")
 
             # Извлекаем JSON-LD
             jsonld = await page.evaluate('''() => {
@@ -131,7 +134,7 @@ class OzonCompetitorParser:
         try:
             search_url = f"https://www.ozon.ru/search/?text={query}&from_global=true"
             await page.goto(search_url, wait_until='domcontentloaded', timeout=30000)
-            await page.wait_for_timeout(3000)
+            await wait_until_ready(page, SEARCH_READY)  # Ждём выдачу
 
             # Извлекаем ссылки на товары
             links = await page.evaluate('''(limit) => {
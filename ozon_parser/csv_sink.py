@@ -0,0 +1,125 @@
+"""
+Потоковая запись результатов в CSV
+
+Раньше CSV писался одним куском после всего батча: падение на SKU 900 из
+1000 теряло всё. CsvSink дописывает строку и сбрасывает файл на диск сразу
+после каждого SKU, а с resume=True продолжает существующий файл и помнит,
+какие SKU в нём уже успешно спарсены - их можно пропустить.
+
+iter_skus читает входной CSV лениво, по строке, чтобы большие файлы не
+грузились в память целиком.
+"""
+
+import csv
+import os
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Set
+
+
+FIELDNAMES = ["sku", "name", "price", "currency", "brand", "rating", "reviews", "availability", "parsed_at", "error"]
+
+# Числовые поля при чтении CSV обратно в результаты
+_NUMERIC = {"price": float, "rating": float, "reviews": int}
+
+
+def iter_skus(filepath: str) -> Iterator[str]:
+    """SKU из первой колонки CSV (заголовок пропускается), по одному"""
+    with open(filepath, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if row and row[0].strip():
+                yield row[0].strip()
+
+
+def failed_result(sku: str, error: str) -> Dict:
+    """Пустой результат с ошибкой для SKU, который не удалось спарсить"""
+    return {"sku": sku, "name": "", "price": 0, "currency": "RUB", "brand": "", "rating": 0, "reviews": 0,
+            "availability": "", "engine": "", "error": error, "parsed_at": datetime.now().isoformat()}
+
+
+def _from_row(row: Dict) -> Dict:
+    result = {field: row.get(field) or "" for field in FIELDNAMES}
+    for field, cast in _NUMERIC.items():
+        try:
+            result[field] = cast(float(result[field] or 0))
+        except ValueError:
+            result[field] = 0
+    return result
+
+
+def read_results(filepath: str) -> Dict[str, Dict]:
+    """Результаты из CSV по SKU; при повторах (ошибка, потом --resume) берётся последняя строка"""
+    results = {}
+    if not os.path.exists(filepath):
+        return results
+    with open(filepath, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("sku"):
+                results[row["sku"]] = _from_row(row)
+    return results
+
+
+class CsvSink:
+    """
+    Запись результатов по одному с flush после каждой строки.
+
+    resume=False - файл создаётся заново;
+    resume=True  - строки дописываются в конец, done содержит SKU, уже
+                   спарсенные без ошибки (SKU с ошибкой парсятся повторно).
+    """
+
+    def __init__(self, filepath: str, resume: bool = False):
+        self.filepath = filepath
+        self.done: Set[str] = set()
+
+        exists = resume and os.path.exists(filepath) and os.path.getsize(filepath) > 0
+        if exists:
+            self.done = {sku for sku, r in read_results(filepath).items() if not r["error"]}
+
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._file = open(filepath, "a" if exists else "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELDNAMES, extrasaction="ignore")
+        if not exists:
+            self._writer.writeheader()
+            self._file.flush()
+
+        # Счётчики для итоговой статистики без хранения всех результатов
+        self.written = 0
+        self.successful = 0
+        self.price_min: Optional[float] = None
+        self.price_max: Optional[float] = None
+        self._price_sum = 0.0
+        self._price_count = 0
+
+    def write(self, result: Dict):
+        self._writer.writerow(result)
+        self._file.flush()
+
+        self.written += 1
+        if result.get("error"):
+            return
+        self.successful += 1
+        price = result.get("price") or 0
+        if price > 0:
+            self.price_min = price if self.price_min is None else min(self.price_min, price)
+            self.price_max = price if self.price_max is None else max(self.price_max, price)
+            self._price_sum += price
+            self._price_count += 1
+
+    @property
+    def price_avg(self) -> Optional[float]:
+        return self._price_sum / self._price_count if self._price_count else None
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> "CsvSink":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -11,7 +11,6 @@ Ozon Parser for GitHub Actions (CLOUD VERSION)
 
 import asyncio
 import argparse
-import csv
 import json
 import random
 import sys
@@ -51,13 +50,38 @@ try:
 except ImportError:
     GSHEETS_AVAILABLE = False
 
+from resource_blocker import ResourceBlocker, PROFILES
+from page_ready import wait_until_ready, PRODUCT_READY, SEARCH_READY
+from page_probe import probe_page
+from search_extractor import extract_search
+from sheet_diff import write_diff
+from csv_sink import CsvSink, failed_result, read_results
+from pacing import AimdPacer
+from circuit_breaker import CircuitBreaker, is_blocked
+
+# Стартовая пауза между страницами поиска (сек), дальше - адаптивно
+SEARCH_DELAY = 12.5
+
+# После стольких размыканий предохранителя parse_batch останавливается
+CIRCUIT_MAX_TRIPS = 3
+
 
 class CloudOzonParser:
     """Парсер Ozon для облачного выполнения"""
 
-    def __init__(self, use_camoufox: bool = True, delay: float = 10.0):
+    def __init__(self, use_camoufox: bool = True, delay: float = 30.0, resources: Optional[str] = None,
+                 min_delay: float = 8.0, max_delay: float = 120.0):
         self.use_camoufox = use_camoufox and CAMOUFOX_AVAILABLE
-        self.delay = delay  # Увеличено с 3 до 10 секунд
+        self.delay = delay
+        # Адаптивные паузы: карточки стартуют с delay, поиск - с SEARCH_DELAY
+        self.pacer = AimdPacer(delay, min_delay, max_delay)
+        self.search_pacer = AimdPacer(SEARCH_DELAY, min_delay, max_delay)
+        # Половина блоков среди последних 3-6 SKU (всегда не меньше двух) - пауза 2 мин,
+        # дальше вдвое дольше; одиночный блок предохранитель не размыкает
+        self.breaker = CircuitBreaker(window=6, min_requests=3, threshold=0.5, cooldown=120)
+        self.last_search_error = ""
+        self.resources = resources  # None = профиль по типу страницы
+        self.blocker = ResourceBlocker("full")
         self.browser = None
         self.page = None
         self._playwright = None
@@ -94,8 +118,15 @@ class CloudOzonParser:
                 Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
             """)
 
+        await self.blocker.attach(self.page)
+
         print("[OK] Browser started")
 
+    def use_resources(self, default: str):
+        """Профиль блокировки для следующей страницы (--resources перекрывает)"""
+        self.blocker.profile = self.resources or default
+        self.blocker.reset()
+
     async def human_behavior(self):
         """Имитация человеческого поведения на странице"""
         try:
@@ -131,6 +162,7 @@ class CloudOzonParser:
         for i, url in enumerate(warmup_urls, 1):
             try:
                 print(f"  [{i}/{len(warmup_urls)}] {url[:60]}...", flush=True)
+                self.use_resources("full")  # Прогрев - как обычный пользователь
                 response = await self.page.goto(url, wait_until="domcontentloaded", timeout=45000)
                 status = response.status if response else "N/A"
                 print(f"  [{i}/{len(warmup_urls)}] HTTP {status}", flush=True)
@@ -175,6 +207,8 @@ class CloudOzonParser:
             "parsed_at": datetime.utcnow().isoformat() + "Z"
         }
 
+        self.use_resources("jsonld-only")
+
         try:
             response = await self.page.goto(url, wait_until="domcontentloaded", timeout=45000)
 
@@ -183,31 +217,19 @@ class CloudOzonParser:
                 result["error"] = f"HTTP {response.status}"
                 return result
 
-            # Ждём загрузку контента + human behavior
-            await asyncio.sleep(random.uniform(2.0, 4.0))
+            # Ждём JSON-LD (или антибот) + human behavior
+            result["ready_ms"] = await wait_until_ready(self.page, PRODUCT_READY)
             await self.human_behavior()
 
-            # Check antibot
-            title = await self.page.title()
-            content = await self.page.content()
+            # Title, antibot и JSON-LD одним evaluate (без page.content())
+            probe = await probe_page(self.page)
 
-            if "Antibot" in title or "captcha" in content.lower() or "robot" in content.lower():
+            if probe["block"]:
                 result["error"] = "ANTIBOT_DETECTED"
-                print(f"  [!] Antibot/Captcha on SKU {sku}")
+                print(f"  [!] Antibot/Captcha on SKU {sku} ({probe['block']})")
                 return result
 
-            # Extract JSON-LD
-            jsonld_data = await self.page.evaluate("""
-                () => {
-                    const script = document.querySelector('script[type="application/ld+json"]');
-                    if (!script) return null;
-                    try {
-                        return JSON.parse(script.textContent);
-                    } catch(e) {
-                        return null;
-                    }
-                }
-            """)
+            jsonld_data = probe["jsonld"]
 
             if jsonld_data:
                 result["name"] = jsonld_data.get("name", "")
@@ -227,7 +249,7 @@ class CloudOzonParser:
                 result["reviews"] = int(rating.get("reviewCount", 0))
             else:
                 # Check if product not found
-                if "товар не найден" in content.lower() or "page not found" in content.lower():
+                if probe["notFound"]:
                     result["error"] = "PRODUCT_NOT_FOUND"
                 else:
                     result["error"] = "JSON_LD_NOT_FOUND"
@@ -235,6 +257,7 @@ class CloudOzonParser:
         except Exception as e:
             result["error"] = str(e)[:100]
 
+        result["traffic"] = self.blocker.stats()
         return result
 
     async def mini_warmup(self):
@@ -246,6 +269,7 @@ class CloudOzonParser:
         ]
         for url in warmup_urls:
             try:
+                self.use_resources("full")
                 await self.page.goto(url, wait_until="domcontentloaded", timeout=30000)
                 await self.human_behavior()
                 await asyncio.sleep(random.uniform(4.0, 6.0))
@@ -265,96 +289,51 @@ class CloudOzonParser:
         Returns:
             Список найденных товаров с ценами
         """
-        import re
         import urllib.parse
 
         encoded_query = urllib.parse.quote(query)
         url = f"https://www.ozon.ru/search/?text={encoded_query}&from_global=true"
 
         results = []
+        self.last_search_error = ""
         print(f"\n[SEARCH] Парсинг поиска: '{query}'", flush=True)
         print(f"  URL: {url[:80]}...", flush=True)
 
+        self.use_resources("search-tiles")
+
         try:
             response = await self.page.goto(url, wait_until="domcontentloaded", timeout=45000)
             status = response.status if response else "N/A"
             print(f"  HTTP: {status}", flush=True)
 
             if response and response.status >= 400:
+                self.last_search_error = f"HTTP {response.status}"
                 print(f"  [ERROR] HTTP {response.status}", flush=True)
                 return results
 
-            # Ждём загрузку + human behavior
-            await asyncio.sleep(random.uniform(3.0, 5.0))
+            # Ждём виджет выдачи (или антибот) + human behavior
+            ready_ms = await wait_until_ready(self.page, SEARCH_READY)
+            print(f"  [READY] {f'{ready_ms} ms' if ready_ms is not None else 'timeout'}", flush=True)
             await self.human_behavior()
 
-            # Проверяем антибот
-            title = await self.page.title()
-            content = await self.page.content()
-            content_len = len(content)
+            # Плитки + JSON-LD + JSON state одним evaluate (в Python - только компактный список)
+            data = await extract_search(self.page, target_skus, html_limit=100000)
+            title = data["title"]
             print(f"  [DEBUG] Page title: {title[:80]}", flush=True)
-            print(f"  [DEBUG] Content length: {content_len} chars", flush=True)
+            print(f"  [TRAFFIC] {self.blocker.summary()}", flush=True)
 
-            if "Antibot" in title or "captcha" in title.lower() or "robot" in content.lower()[:5000]:
-                print("  [ERROR] ANTIBOT_DETECTED on search page", flush=True)
-                # Сохраним HTML для анализа
-                print(f"  [DEBUG] First 500 chars: {content[:500]}", flush=True)
+            if data["block"]:
+                self.last_search_error = "ANTIBOT_DETECTED"
+                print(f"  [ERROR] ANTIBOT_DETECTED on search page ({data['block']})", flush=True)
+                print(f"  [DEBUG] First 500 chars: {data['html'][:500]}", flush=True)
                 return results
 
-            # === МЕТОД 1: Извлечение из JSON State ===
-            print("  [DEBUG] Поиск JSON state...", flush=True)
-
-            json_data = await self.page.evaluate("""
-                () => {
-                    // Ищем __NUXT_DATA__, __NEXT_DATA__, или другие JSON state
-                    const scripts = document.querySelectorAll('script');
-                    for (const script of scripts) {
-                        const text = script.textContent || '';
-                        // Ищем паттерны с данными товаров
-                        if (text.includes('products') || text.includes('items') || text.includes('searchResultsV2')) {
-                            // Пытаемся извлечь JSON
-                            const matches = text.match(/\{[^{}]*"sku"[^{}]*\}/g);
-                            if (matches && matches.length > 0) {
-                                return { source: 'inline_json', count: matches.length, sample: matches[0] };
-                            }
-                        }
-                    }
-
-                    // Ищем window.__INITIAL_STATE__
-                    if (window.__INITIAL_STATE__) {
-                        return { source: '__INITIAL_STATE__', data: window.__INITIAL_STATE__ };
-                    }
-
-                    // Ищем NUXT
-                    if (window.__NUXT__) {
-                        return { source: '__NUXT__', keys: Object.keys(window.__NUXT__) };
-                    }
-
-                    return { source: 'not_found' };
-                }
-            """)
-
-            print(f"  [DEBUG] JSON source: {json_data.get('source', 'unknown')}", flush=True)
-
-            # === МЕТОД 2: Парсинг DOM карточек товаров ===
-            print("  [DOM] Извлечение карточек товаров...", flush=True)
-
-            # Сначала посчитаем что есть на странице
-            dom_stats = await self.page.evaluate("""
-                () => {
-                    return {
-                        searchResultsV2: document.querySelectorAll('[data-widget="searchResultsV2"]').length,
-                        dataIndex: document.querySelectorAll('[data-index]').length,
-                        productLinks: document.querySelectorAll('a[href*="/product/"]').length,
-                        allLinks: document.querySelectorAll('a').length,
-                        allDivs: document.querySelectorAll('div').length,
-                        scripts: document.querySelectorAll('script').length,
-                        jsonLd: document.querySelectorAll('script[type="application/ld+json"]').length
-                    };
-                }
-            """)
+            dom_stats = data["stats"]
+            counts = data["counts"]
+            print(f"  [DEBUG] JSON source: {data['stateSource']} ({data['stateNodes']} nodes)", flush=True)
             print(f"  [DOM STATS] searchResultsV2={dom_stats.get('searchResultsV2')}, dataIndex={dom_stats.get('dataIndex')}, productLinks={dom_stats.get('productLinks')}", flush=True)
-            print(f"  [DOM STATS] allLinks={dom_stats.get('allLinks')}, allDivs={dom_stats.get('allDivs')}, scripts={dom_stats.get('scripts')}, jsonLd={dom_stats.get('jsonLd')}", flush=True)
+            print(f"  [DOM STATS] cards={dom_stats.get('cards')}, scripts={dom_stats.get('scripts')}, jsonLd={dom_stats.get('jsonLd')}", flush=True)
+            print(f"  [SOURCES] tiles={counts['tiles']}, jsonld={counts['jsonld']}, state={counts['state']}", flush=True)
 
             # === СОХРАНЯЕМ DEBUG ИНФОРМАЦИЮ В ФАЙЛЫ ===
             debug_dir = Path("debug")
@@ -368,8 +347,8 @@ class CloudOzonParser:
 
             # 2. HTML страницы (первые 100KB)
             html_path = debug_dir / f"search_{timestamp}.html"
-            html_path.write_text(content[:100000], encoding="utf-8")
-            print(f"  [DEBUG] HTML saved: {html_path} ({len(content[:100000])} chars)", flush=True)
+            html_path.write_text(data["html"], encoding="utf-8")
+            print(f"  [DEBUG] HTML saved: {html_path} ({len(data['html'])} chars)", flush=True)
 
             # 3. Debug JSON
             debug_data = {
@@ -378,137 +357,35 @@ class CloudOzonParser:
                 "url": url,
                 "http_status": status,
                 "page_title": title,
-                "content_length": content_len,
                 "dom_stats": dom_stats,
-                "json_source": json_data.get('source', 'unknown'),
+                "source_counts": counts,
+                "json_source": data["stateSource"],
+                "traffic": self.blocker.stats(),
+                "ready_ms": ready_ms,
             }
             debug_json_path = debug_dir / f"debug_{timestamp}.json"
             debug_json_path.write_text(json.dumps(debug_data, indent=2, ensure_ascii=False), encoding="utf-8")
             print(f"  [DEBUG] JSON saved: {debug_json_path}", flush=True)
 
-            products_data = await self.page.evaluate("""
-                () => {
-                    const products = [];
-                    const debug = { foundCards: 0, parsedProducts: 0, errors: [] };
-
-                    // Ozon использует data-widget="searchResultsV2" для результатов
-                    const container = document.querySelector('[data-widget="searchResultsV2"]');
-                    if (!container) {
-                        debug.errors.push('No searchResultsV2 container');
-                    }
-
-                    // Ищем карточки товаров по разным селекторам
-                    const cards = document.querySelectorAll('div[class*="tile"], div[class*="product"], a[href*="/product/"]');
-                    debug.foundCards = cards.length;
-
-                    for (const card of cards) {
-                        try {
-                            // Извлекаем ссылку с SKU
-                            const link = card.querySelector('a[href*="/product/"]') || card.closest('a[href*="/product/"]');
-                            if (!link) continue;
-
-                            const href = link.getAttribute('href') || '';
-                            const skuMatch = href.match(/\/product\/([a-z0-9-]+)/i);
-                            if (!skuMatch) continue;
-
-                            const sku = skuMatch[1];
-
-                            // Ищем цену
-                            let price = 0;
-                            const priceEl = card.querySelector('[class*="price"], [class*="Price"], span[class*="c3"]');
-                            if (priceEl) {
-                                const priceText = priceEl.textContent || '';
-                                // Убираем пробелы и ₽, оставляем цифры
-                                const priceMatch = priceText.replace(/\s/g, '').match(/(\d+)/);
-                                if (priceMatch) {
-                                    price = parseInt(priceMatch[1], 10);
-                                }
-                            }
-
-                            // Ищем название
-                            let name = '';
-                            const nameEl = card.querySelector('[class*="title"], [class*="name"], span[class*="tsBody"]');
-                            if (nameEl) {
-                                name = nameEl.textContent?.trim() || '';
-                            }
-
-                            if (sku && price > 0) {
-                                products.push({ sku, name: name.slice(0, 150), price });
-                                debug.parsedProducts++;
-                            }
-                        } catch (e) {
-                            debug.errors.push(e.message);
-                        }
-                    }
-
-                    return { products, debug };
-                }
-            """)
-
-            debug_info = products_data.get('debug', {})
-            products_data = products_data.get('products', [])
-            print(f"  [DOM] foundCards={debug_info.get('foundCards')}, parsedProducts={debug_info.get('parsedProducts')}", flush=True)
-            if debug_info.get('errors'):
-                print(f"  [DOM ERRORS] {debug_info.get('errors')[:3]}", flush=True)
-
-            # === МЕТОД 3: Парсинг через JSON-LD (если есть) ===
-            jsonld_products = await self.page.evaluate("""
-                () => {
-                    const scripts = document.querySelectorAll('script[type="application/ld+json"]');
-                    const products = [];
-
-                    for (const script of scripts) {
-                        try {
-                            const data = JSON.parse(script.textContent);
-                            if (data['@type'] === 'ItemList' && data.itemListElement) {
-                                for (const item of data.itemListElement) {
-                                    if (item.item && item.item.offers) {
-                                        products.push({
-                                            sku: item.item.sku || '',
-                                            name: item.item.name || '',
-                                            price: parseFloat(item.item.offers.price) || 0
-                                        });
-                                    }
-                                }
-                            }
-                        } catch (e) {}
-                    }
-
-                    return products;
-                }
-            """)
+            # Товары уже без дублей и отфильтрованы по target_skus в браузере
+            for p in data["products"]:
+                results.append({
+                    "sku": p["sku"],
+                    "name": p["name"],
+                    "price": p["price"],
+                    "currency": "RUB",
+                    "brand": "",
+                    "rating": 0,
+                    "reviews": 0,
+                    "availability": "InStock" if p["price"] > 0 else "Unknown",
+                    "error": "",
+                    "parsed_at": datetime.utcnow().isoformat() + "Z",
+                    "source": "search_page"
+                })
 
-            print(f"  [JSON-LD] Найдено: {len(jsonld_products)}", flush=True)
-
-            # Объединяем результаты из всех методов
-            all_products = products_data + jsonld_products
-
-            # Дедупликация по SKU
-            seen_skus = set()
-            for p in all_products:
-                sku = str(p.get('sku', '')).split('-')[0]  # Убираем суффикс если есть
-                if sku and sku not in seen_skus:
-                    seen_skus.add(sku)
-                    results.append({
-                        "sku": sku,
-                        "name": p.get('name', ''),
-                        "price": p.get('price', 0),
-                        "currency": "RUB",
-                        "brand": "",
-                        "rating": 0,
-                        "reviews": 0,
-                        "availability": "InStock" if p.get('price', 0) > 0 else "Unknown",
-                        "error": "",
-                        "parsed_at": datetime.utcnow().isoformat() + "Z",
-                        "source": "search_page"
-                    })
-
-            # Фильтруем по target_skus если заданы
             if target_skus:
-                target_set = set(str(s) for s in target_skus)
-                filtered = [r for r in results if r['sku'] in target_set]
-                print(f"  [FILTER] Совпадений с целевыми SKU: {len(filtered)}/{len(target_skus)}", flush=True)
-                return filtered
+                print(f"  [FILTER] Совпадений с целевыми SKU: {len(results)}/{len(target_skus)}", flush=True)
+                return results
 
             print(f"  [RESULT] Всего уникальных товаров: {len(results)}", flush=True)
 
@@ -517,80 +394,83 @@ class CloudOzonParser:
                 print(f"    {i+1}. SKU {p['sku']}: {p['price']} RUB - {p['name'][:50]}...", flush=True)
 
         except Exception as e:
+            self.last_search_error = str(e)[:100]
             print(f"  [ERROR] {str(e)[:100]}", flush=True)
 
         return results
 
-    async def parse_search_batch(self, queries: List[str], target_skus: List[str] = None) -> List[Dict]:
+    async def parse_search_batch(self, queries: List[str], target_skus: List[str] = None,
+                                 on_result=None) -> List[Dict]:
         """
         Парсинг нескольких поисковых запросов.
 
         Args:
             queries: Список поисковых запросов
             target_skus: Целевые SKU для сопоставления
+            on_result: Вызывается для каждого нового (уникального) товара сразу после его запроса
         """
-        all_results = []
+        # Дедупликация по ходу, чтобы on_result получал каждый SKU один раз
+        seen = set()
+        unique_results = []
 
         for i, query in enumerate(queries, 1):
+            # Адаптивная пауза между запросами
+            await self.search_pacer.acquire()
+            probe = await self.breaker.acquire()
             print(f"\n[{i}/{len(queries)}] Обрабатываем запрос: '{query}'", flush=True)
 
-            results = await self.parse_search_page(query, target_skus)
-            all_results.extend(results)
-
-            # Задержка между запросами
-            if i < len(queries):
-                delay = random.uniform(10.0, 15.0)
-                print(f"  Ожидание {delay:.1f}с перед следующим запросом...", flush=True)
-                await asyncio.sleep(delay)
+            for r in await self.parse_search_page(query, target_skus):
+                if r['sku'] not in seen:
+                    seen.add(r['sku'])
+                    unique_results.append(r)
+                    if on_result:
+                        on_result(r)
 
-        # Дедупликация финальных результатов
-        seen = set()
-        unique_results = []
-        for r in all_results:
-            if r['sku'] not in seen:
-                seen.add(r['sku'])
-                unique_results.append(r)
+            outcome = {"error": self.last_search_error}
+            if self.search_pacer.observe(outcome):
+                print(f"  [PACE] Slowing down: {self.search_pacer}", flush=True)
+            if self.breaker.record(is_blocked(outcome), probe) and self.breaker.trips >= CIRCUIT_MAX_TRIPS:
+                print(f"\n[ABORT] Circuit opened {self.breaker.trips} times, stopping")
+                break
 
         print(f"\n[TOTAL] Найдено уникальных товаров: {len(unique_results)}", flush=True)
         return unique_results
 
-    async def parse_batch(self, skus: List[str]) -> List[Dict]:
-        """Парсинг списка SKU с re-warmup при блокировке"""
+    async def parse_batch(self, skus: List[str], on_result=None) -> List[Dict]:
+        """
+        Парсинг списка SKU (on_result - сразу после каждого SKU).
+
+        При волне блокировок предохранитель ставит парсинг на паузу, затем
+        re-warmup и один пробный SKU. После CIRCUIT_MAX_TRIPS размыканий -
+        стоп, чтобы не жечь минуты Actions впустую.
+        """
         results = []
         total = len(skus)
-        antibot_count = 0
-        consecutive_antibot = 0
 
         for i, sku in enumerate(skus, 1):
+            # Адаптивная пауза: разгон на успехах, x2 медленнее на 429/5xx/таймаутах/антиботе
+            await self.pacer.acquire()
+            probe = await self.breaker.acquire()
+            if probe:
+                await self.mini_warmup()
             print(f"[{i}/{total}] SKU {sku}...", end=" ", flush=True)
 
             result = await self.parse_product(sku)
             results.append(result)
+            if on_result:
+                on_result(result)
 
             if result["error"]:
                 print(f"ERROR: {result['error']}")
-                if result["error"] == "ANTIBOT_DETECTED":
-                    antibot_count += 1
-                    consecutive_antibot += 1
-
-                    # После 2 подряд блокировок - re-warmup
-                    if consecutive_antibot >= 2:
-                        await self.mini_warmup()
-                        consecutive_antibot = 0
-
-                    # Абортируем только после 5 блокировок подряд
-                    if antibot_count >= 5:
-                        print("\n[ABORT] Too many antibot detections, stopping")
-                        break
             else:
                 print(f"{result['price']} RUB | {result['rating']}* | {result['reviews']} reviews")
-                consecutive_antibot = 0  # Сброс счётчика при успехе
 
-            # Увеличенная задержка 25-35 сек
-            if i < total:
-                delay = 25.0 + random.uniform(0, 10.0)
-                print(f"    Ожидание {delay:.1f}с перед следующим товаром...", flush=True)
-                await asyncio.sleep(delay)
+            if self.pacer.observe(result):
+                print(f"    [PACE] Slowing down: {self.pacer}", flush=True)
+
+            if self.breaker.record(is_blocked(result), probe) and self.breaker.trips >= CIRCUIT_MAX_TRIPS:
+                print(f"\n[ABORT] Circuit opened {self.breaker.trips} times, stopping")
+                break
 
         return results
 
@@ -679,8 +559,8 @@ def read_skus_from_sheets(gc, sheet_id: str) -> List[str]:
         return []
 
 
-def write_results_to_sheets(gc, sheet_id: str, results: List[Dict]):
-    """Записывает результаты в Google Sheets"""
+def write_results_to_sheets(gc, sheet_id: str, results: List[Dict], full_write: bool = False):
+    """Записывает результаты в Google Sheets (по умолчанию только изменившиеся ячейки)"""
     try:
         spreadsheet = gc.open_by_key(sheet_id)
         worksheet = spreadsheet.worksheet("Парсинг товаров")
@@ -698,7 +578,10 @@ def write_results_to_sheets(gc, sheet_id: str, results: List[Dict]):
                 r["error"]
             ])
 
-        if rows:
+        if rows and not full_write:
+            changed, total = write_diff(worksheet, rows, start_row=2)
+            print(f"[OK] Google Sheets: {changed}/{total} cells changed")
+        elif rows:
             worksheet.update(values=rows, range_name=f"B2:I{1 + len(rows)}")
             print(f"[OK] Updated {len(rows)} rows in Google Sheets")
 
@@ -706,27 +589,23 @@ def write_results_to_sheets(gc, sheet_id: str, results: List[Dict]):
         print(f"[ERROR] Writing to sheets: {e}")
 
 
-def write_csv(filepath: str, results: List[Dict]):
-    """Записывает результаты в CSV"""
-    fieldnames = ["sku", "name", "price", "currency", "brand", "rating", "reviews", "availability", "parsed_at", "error"]
-
-    with open(filepath, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
-
-    print(f"[OK] Saved to {filepath}")
-
-
 async def main():
     parser = argparse.ArgumentParser(description="Ozon Parser for GitHub Actions")
     parser.add_argument("--limit", type=int, default=0, help="Limit SKUs (0 = all)")
     parser.add_argument("--test", action="store_true", help="Test mode (no save)")
     parser.add_argument("--skus", nargs="+", help="Manual SKU list")
-    parser.add_argument("--delay", type=float, default=10.0, help="Delay between requests (10-15s recommended)")
+    parser.add_argument("--delay", type=float, default=30.0, help="Starting delay between product pages, s")
+    parser.add_argument("--min-delay", type=float, default=8.0, help="Fastest pacing the delay may ramp up to, s")
+    parser.add_argument("--max-delay", type=float, default=120.0, help="Slowest pacing after blocks/429/5xx, s")
     parser.add_argument("--no-camoufox", action="store_true", help="Use standard Playwright")
     parser.add_argument("--search", action="store_true", help="Use SEARCH page parsing (v4 mode)")
     parser.add_argument("--queries", nargs="+", default=["fuchs titan"], help="Search queries for --search mode")
+    parser.add_argument("--resources", choices=list(PROFILES), default=None,
+                        help="Resource blocking profile (default: jsonld-only for products, search-tiles for search)")
+    parser.add_argument("--full-write", action="store_true", help="Rewrite the whole B:I block instead of changed cells")
+    parser.add_argument("--output", default="", help="Results CSV (default: results_<timestamp>.csv)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Append to --output and skip SKUs already parsed without error (not with --search)")
 
     args = parser.parse_args()
 
@@ -741,7 +620,7 @@ async def main():
     if args.search:
         print(f"  Queries: {args.queries}")
     else:
-        print(f"  Delay: 25-35s between products")
+        print(f"  Delay: {args.delay:g}s start, adaptive {args.min_delay:g}-{args.max_delay:g}s")
     print(f"  Test mode: {args.test}")
     print("=" * 60)
     print()
@@ -776,10 +655,27 @@ async def main():
         skus = skus[:args.limit]
         print(f"[INFO] Limited to {args.limit} SKUs")
 
+    if args.resume and not args.output:
+        print("[ERROR] --resume needs --output with the file to continue")
+        sys.exit(1)
+    if args.resume and args.search:
+        # CSV stores found SKUs, not finished queries: there is nothing to skip by
+        print("[ERROR] --resume works only for product pages, not with --search")
+        sys.exit(1)
+
+    # Results are appended to the CSV as each SKU finishes
+    csv_path = args.output or f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    sink = CsvSink(csv_path, resume=args.resume)
+    if args.resume:
+        print(f"[INFO] Resume: {len(sink.done)} SKUs already in {csv_path}")
+
     # Parse
     ozon = CloudOzonParser(
         use_camoufox=CAMOUFOX_AVAILABLE and not args.no_camoufox,
-        delay=args.delay
+        delay=args.delay,
+        resources=args.resources,
+        min_delay=args.min_delay,
+        max_delay=args.max_delay
     )
 
     try:
@@ -790,16 +686,19 @@ async def main():
         if args.search:
             # v4: Парсинг страниц ПОИСКА (одна страница = много товаров)
             print(f"\n[START] Parsing SEARCH pages: {args.queries}")
-            results = await ozon.parse_search_batch(args.queries, target_skus=skus if skus else None)
+            results = await ozon.parse_search_batch(args.queries, target_skus=skus if skus else None,
+                                                    on_result=sink.write)
         else:
             # v3: Парсинг отдельных карточек товаров (старый метод)
-            print(f"\n[START] Parsing {len(skus)} product pages...")
-            results = await ozon.parse_batch(skus)
+            pending = [sku for sku in skus if sku not in sink.done]
+            print(f"\n[START] Parsing {len(pending)} product pages...")
+            results = await ozon.parse_batch(pending, on_result=sink.write)
+            if args.resume:
+                # Sheets are written by row position: merge with the rows parsed before
+                by_sku = read_results(csv_path)
+                results = [by_sku.get(sku) or failed_result(sku, "No result") for sku in skus]
 
-        # Save results
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_path = f"results_{timestamp}.csv"
-        write_csv(csv_path, results)
+        print(f"[OK] Saved to {csv_path}")
 
         if not args.test:
             # Save to Supabase
@@ -809,7 +708,7 @@ async def main():
 
             # Update Google Sheets
             if gc and sheet_id:
-                write_results_to_sheets(gc, sheet_id, results)
+                write_results_to_sheets(gc, sheet_id, results, full_write=args.full_write)
 
         # Stats
         successful = [r for r in results if not r.get("error")]
@@ -834,6 +733,7 @@ async def main():
             print(f"\n[OK] Successfully parsed {len(results)} products")
 
     finally:
+        sink.close()
         await ozon.close()
 
 
@@ -0,0 +1,245 @@
+"""
+Очередь SKU-заданий для воркеров (сторона воркера)
+
+Northflank API кладёт SKU в очередь (api/services/job_queue.py), воркеры
+на домашних ПК берут задание в аренду (lease), продлевают её, пока парсят
+(heartbeat), и возвращают результат (complete). Если воркер упал и аренда
+истекла - задание возвращается в очередь, после MAX_ATTEMPTS попыток
+завершается с ошибкой.
+
+Бэкенды:
+  redis://host:6379/0      - Redis или совместимый сервер (нужен pip install redis)
+  sqlite:///data/jobs.db   - файл, для локальной проверки (API и воркер на одной машине)
+
+Схема ключей Redis и таблица SQLite должны совпадать с api/services/job_queue.py.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+# После стольких истёкших аренд задание завершается с ошибкой
+MAX_ATTEMPTS = 3
+
+# Сколько хранить готовые задания (результаты), сек
+RESULT_TTL = 3600
+
+
+def _lost_error(attempts: int) -> str:
+    return f"Worker lost the job {attempts} times"
+
+
+class SqliteJobQueue:
+    """Очередь в файле SQLite"""
+
+    def __init__(self, path: str = "data/jobs.db"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Воркер ходит в очередь через asyncio.to_thread: соединение общее
+        # для потоков, каждый запрос и транзакция - под lock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                sku TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def enqueue(self, sku: str) -> str:
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (job_id, sku, status, created_at) VALUES (?, ?, 'pending', ?)",
+            (job_id, sku, time.time())
+        )
+        return job_id
+
+    def lease(self, worker: str, seconds: float) -> Optional[Dict]:
+        with self._lock:
+            return self._lease(worker, seconds)
+
+    def _lease(self, worker: str, seconds: float) -> Optional[Dict]:
+        now = time.time()
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Истёкшие аренды: обратно в очередь или ошибка после MAX_ATTEMPTS
+            for job_id, sku, attempts in db.execute(
+                "SELECT job_id, sku, attempts FROM jobs WHERE status = 'leased' AND lease_until < ?", (now,)
+            ).fetchall():
+                if attempts >= MAX_ATTEMPTS:
+                    db.execute(
+                        "UPDATE jobs SET status = 'done', result = ?, lease_until = ? WHERE job_id = ?",
+                        (json.dumps({"sku": sku, "error": _lost_error(attempts)}), now, job_id)
+                    )
+                else:
+                    db.execute("UPDATE jobs SET status = 'pending', worker = NULL WHERE job_id = ?", (job_id,))
+
+            # Старые результаты больше никому не нужны
+            db.execute("DELETE FROM jobs WHERE status = 'done' AND lease_until < ?", (now - RESULT_TTL,))
+
+            row = db.execute(
+                "SELECT job_id, sku, attempts FROM jobs WHERE status = 'pending' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if not row:
+                db.execute("COMMIT")
+                return None
+
+            job_id, sku, attempts = row
+            db.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE job_id = ?",
+                (worker, now + seconds, job_id)
+            )
+            db.execute("COMMIT")
+            return {"job_id": job_id, "sku": sku, "attempts": attempts + 1}
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def heartbeat(self, job_id: str, worker: str, seconds: float) -> bool:
+        """Продлить аренду; False - задание уже не наше (истекло или отменено)"""
+        cur = self._execute(
+            "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + seconds, job_id, worker)
+        )
+        return cur.rowcount == 1
+
+    def complete(self, job_id: str, worker: str, result: Dict):
+        self._execute(
+            "UPDATE jobs SET status = 'done', result = ?, lease_until = ? WHERE job_id = ? AND status != 'done'",
+            (json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id)
+        )
+
+    def close(self):
+        self._db.close()
+
+
+# Атомарная аренда: вернуть истёкшие задания в очередь и взять следующее
+LEASE_LUA = """
+local pending, leases, prefix = KEYS[1], KEYS[2], ARGV[1]
+local now, deadline, worker = tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4]
+local max_attempts, ttl = tonumber(ARGV[5]), tonumber(ARGV[6])
+
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', leases, '-inf', now)) do
+    redis.call('ZREM', leases, id)
+    local key = prefix .. 'job:' .. id
+    if redis.call('EXISTS', key) == 1 then
+        local attempts = tonumber(redis.call('HGET', key, 'attempts') or '0')
+        if attempts >= max_attempts then
+            local result = cjson.encode({sku = redis.call('HGET', key, 'sku'),
+                                         error = 'Worker lost the job ' .. attempts .. ' times'})
+            redis.call('HSET', key, 'status', 'done', 'result', result)
+            redis.call('EXPIRE', key, ttl)
+        else
+            redis.call('HSET', key, 'status', 'pending', 'worker', '')
+            redis.call('RPUSH', pending, id)
+        end
+    end
+end
+
+while true do
+    local id = redis.call('RPOP', pending)
+    if not id then return nil end
+    local key = prefix .. 'job:' .. id
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('ZADD', leases, deadline, id)
+        redis.call('HSET', key, 'status', 'leased', 'worker', worker)
+        local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+        return {id, redis.call('HGET', key, 'sku'), attempts}
+    end
+end
+"""
+
+HEARTBEAT_LUA = """
+if redis.call('HGET', KEYS[2], 'worker') ~= ARGV[1] or redis.call('HGET', KEYS[2], 'status') ~= 'leased' then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', ARGV[2], ARGV[3])
+return 1
+"""
+
+
+class RedisJobQueue:
+    """Очередь в Redis: jobs:pending (LIST), jobs:leases (ZSET), job:{id} (HASH)"""
+
+    PREFIX = "ozon:"
+
+    def __init__(self, url: str):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("Нужен пакет redis: pip install redis")
+        self.r = redis.Redis.from_url(url, decode_responses=True)
+        self._lease = self.r.register_script(LEASE_LUA)
+        self._heartbeat = self.r.register_script(HEARTBEAT_LUA)
+
+    def _key(self, name: str) -> str:
+        return self.PREFIX + name
+
+    def enqueue(self, sku: str) -> str:
+        job_id = uuid.uuid4().hex
+        pipe = self.r.pipeline()
+        pipe.hset(self._key(f"job:{job_id}"), mapping={"sku": sku, "status": "pending", "attempts": 0})
+        pipe.lpush(self._key("jobs:pending"), job_id)
+        pipe.execute()
+        return job_id
+
+    def lease(self, worker: str, seconds: float) -> Optional[Dict]:
+        now = time.time()
+        job = self._lease(
+            keys=[self._key("jobs:pending"), self._key("jobs:leases")],
+            args=[self.PREFIX, now, now + seconds, worker, MAX_ATTEMPTS, RESULT_TTL]
+        )
+        if not job:
+            return None
+        job_id, sku, attempts = job
+        return {"job_id": job_id, "sku": sku, "attempts": int(attempts)}
+
+    def heartbeat(self, job_id: str, worker: str, seconds: float) -> bool:
+        return bool(self._heartbeat(
+            keys=[self._key("jobs:leases"), self._key(f"job:{job_id}")],
+            args=[worker, time.time() + seconds, job_id]
+        ))
+
+    def complete(self, job_id: str, worker: str, result: Dict):
+        key = self._key(f"job:{job_id}")
+        if not self.r.exists(key):
+            return  # задание отменили, пока парсили
+        pipe = self.r.pipeline()
+        pipe.hset(key, mapping={"status": "done", "result": json.dumps(result, ensure_ascii=False, default=str)})
+        pipe.expire(key, RESULT_TTL)
+        pipe.zrem(self._key("jobs:leases"), job_id)
+        pipe.execute()
+
+    def close(self):
+        self.r.close()
+
+
+def open_job_queue(url: str):
+    """redis://... -> RedisJobQueue, sqlite:///путь или просто путь -> SqliteJobQueue"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobQueue(url)
+    return SqliteJobQueue(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url)
@@ -0,0 +1,90 @@
+"""
+Темп запросов к Ozon
+
+AimdPacer - адаптивная пауза между запросами (AIMD, как в TCP): пока
+страницы открываются, темп растёт понемногу (аддитивно), а на HTTP 429/5xx,
+таймаут или антибот - падает вдвое (мультипликативно). Пауза всегда
+в пределах [min_delay, max_delay], так что парсер держится около самого
+быстрого темпа, который Ozon терпит сейчас, а не худшего случая.
+
+Один AimdPacer на процесс: сколько бы вкладок ни работало параллельно,
+Ozon видит один общий темп.
+"""
+
+import asyncio
+import random
+import re
+import time
+from typing import Dict, Optional
+
+
+# Ошибки, которые означают "слишком часто": rate limit, сбой сервера, таймаут, антибот
+_CONGESTION = re.compile(r"^HTTP (429|5\d\d)\b|timeout|antibot", re.IGNORECASE)
+
+
+def is_congestion(error: Optional[str]) -> bool:
+    return bool(error) and bool(_CONGESTION.search(error))
+
+
+def congested(result: Dict) -> bool:
+    """
+    Был ли сигнал перегрузки при парсинге SKU: в итоговой ошибке или в любой
+    из попыток (HTTP-движок получил 429, а браузер потом справился - темп
+    всё равно слишком высокий).
+    """
+    if result.get("blocked") or is_congestion(result.get("error")):
+        return True
+    return any(is_congestion(a.get("error")) for a in result.get("attempts", []))
+
+
+class AimdPacer:
+    """
+    delay - стартовая пауза, сек; min_delay/max_delay - границы.
+    ramp - за сколько успехов подряд темп дорастает от самого медленного
+    до самого быстрого; backoff - во сколько раз падает темп при перегрузке.
+    jitter - случайный разброс паузы (+-доля), чтобы запросы не шли ровной сеткой.
+
+    acquire() ждёт очереди перед запросом, observe(result) - после.
+    """
+
+    def __init__(self, delay: float, min_delay: float, max_delay: float,
+                 ramp: int = 50, backoff: float = 2.0, jitter: float = 0.3):
+        self.min_delay = max(min_delay, 0.1)
+        self.max_delay = max(max_delay, self.min_delay)
+        self.backoff = backoff
+        self.jitter = jitter
+        self._step = (1 / self.min_delay - 1 / self.max_delay) / max(ramp, 1)
+        self.rate = 1 / min(max(delay, self.min_delay), self.max_delay)
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+        self.slowdowns = 0
+
+    @property
+    def delay(self) -> float:
+        return 1 / self.rate
+
+    async def acquire(self):
+        # Вызывающие занимают слоты по очереди и спят вне lock
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def observe(self, result: Dict) -> bool:
+        """Учесть результат SKU; True - был сигнал перегрузки и темп снижен"""
+        if congested(result):
+            self.slow_down()
+            return True
+        self.rate = min(1 / self.min_delay, self.rate + self._step)
+        return False
+
+    def slow_down(self):
+        self.rate = max(1 / self.max_delay, self.rate / self.backoff)
+        self.slowdowns += 1
+        # Уже занятый следующий слот отодвигается под новую паузу
+        self._next = max(self._next, time.monotonic() + self.delay)
+
+    def __str__(self) -> str:
+        return f"пауза {self.delay:.1f}с ({self.min_delay:g}-{self.max_delay:g}с)"
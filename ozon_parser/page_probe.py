@@ -0,0 +1,59 @@
+"""
+Проба страницы за один round-trip
+
+Один page.evaluate вместо цепочки title() -> content() -> evaluate():
+не гоняем весь HTML (несколько МБ) через CDP ради проверки антибота.
+Тот же JS используется в api/services/page_probe.py.
+"""
+
+from typing import Dict
+
+
+# Выполняется в странице, возвращает компактный результат:
+#   title    - заголовок (обрезанный)
+#   block    - null, "antibot", "captcha" или "denied"
+#   jsonld   - Product JSON-LD только с нужными полями
+#   notFound - true на странице "товар не найден"
+PROBE_JS = """
+    () => {
+        const title = document.title || '';
+
+        let jsonld = null;
+        for (const script of document.querySelectorAll('script[type="application/ld+json"]')) {
+            try {
+                const data = JSON.parse(script.textContent);
+                if (!jsonld || data['@type'] === 'Product') jsonld = data;
+                if (data['@type'] === 'Product') break;
+            } catch (e) {}
+        }
+        if (jsonld) {
+            const keep = ['@type', 'sku', 'name', 'brand', 'offers', 'aggregateRating'];
+            jsonld = Object.fromEntries(keep.filter(k => k in jsonld).map(k => [k, jsonld[k]]));
+        }
+
+        let block = /Antibot|Challenge/i.test(title) ? 'antibot' : null;
+        let notFound = false;
+
+        // Страницы блокировки и 404 маленькие - читать их текст дёшево
+        if (!jsonld) {
+            const text = ((document.body && document.body.innerText) || '').slice(0, 3000).toLowerCase();
+            const lowerTitle = title.toLowerCase();
+            // "робот" - только фразой в заголовке: в карточках он встречается (робот-пылесос)
+            const challenge = document.querySelector(
+                '#challenge, .challenge, form[action*="challenge"], iframe[src*="captcha"]');
+            if (!block && (challenge || /captcha|капч/.test(text) || /не робот|not a robot|are you a robot/.test(lowerTitle))) {
+                block = 'captcha';
+            }
+            if (!block && /доступ ограничен|access denied/.test(text + lowerTitle)) block = 'denied';
+            notFound = /товар не найден|такой страницы нет|page not found/.test(text + lowerTitle);
+        }
+
+        return { title: title.slice(0, 200), block, jsonld, notFound };
+    }
+"""
+
+
+async def probe_page(page) -> Dict:
+    """Заголовок, тип блокировки, JSON-LD и флаг "не найден" одним запросом"""
+    probe = await page.evaluate(PROBE_JS)
+    return probe or {"title": "", "block": None, "jsonld": None, "notFound": False}
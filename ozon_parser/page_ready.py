@@ -0,0 +1,61 @@
+"""
+Ожидание готовности страницы по событию вместо фиксированных sleep
+
+Возвращаемся сразу, как только в DOM появился нужный элемент:
+  карточка товара - <script type="application/ld+json">
+  страница поиска - виджет searchResultsV2
+"""
+
+import asyncio
+from typing import Optional
+
+
+PRODUCT_READY = 'script[type="application/ld+json"]'
+SEARCH_READY = '[data-widget="searchResultsV2"]'
+
+# Жёсткий потолок ожидания (сек)
+READY_TIMEOUT = 10.0
+
+# true, когда селектор в DOM (или открыта страница антибота)
+_READY_JS = """
+    ([selector, stopOnBlock]) => {
+        if (document.querySelector(selector)) return true;
+        return stopOnBlock && /Antibot|Challenge/i.test(document.title);
+    }
+"""
+
+
+async def wait_until_ready(
+    page,
+    selector: str = PRODUCT_READY,
+    timeout: float = READY_TIMEOUT,
+    stop_on_block: bool = True
+) -> Optional[int]:
+    """
+    Ждёт появления selector в DOM.
+
+    Возвращает время до готовности в мс или None, если упёрлись в потолок.
+    stop_on_block=True - выходим и на странице антибота (без ожидания потолка).
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + timeout
+
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None
+
+        try:
+            await page.wait_for_function(
+                _READY_JS,
+                arg=[selector, stop_on_block],
+                timeout=remaining * 1000,
+                polling=100
+            )
+            return int((loop.time() - started) * 1000)
+        except Exception as e:
+            if type(e).__name__ == "TimeoutError":
+                return None
+            # Редирект антибота уничтожил контекст страницы - ждём дальше
+            await asyncio.sleep(0.1)
@@ -0,0 +1,102 @@
+"""
+Блокировка лишних ресурсов при загрузке страниц Ozon (page.route)
+
+Профили:
+  jsonld-only   - карточка товара: только HTML с JSON-LD и скрипты Ozon
+  search-tiles  - страница поиска: плитки рисуют скрипты Ozon, CSS оставляем
+  full          - ничего не блокируем (только считаем трафик)
+"""
+
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+
+# Хосты Ozon - их скрипты/XHR нужны странице и антиботу
+FIRST_PARTY_HOSTS = ("ozon.ru", "ozone.ru", "ozonusercontent.com")
+
+PROFILES: Dict[str, Dict] = {
+    "jsonld-only": {
+        "blocked_types": {"image", "media", "font", "stylesheet", "texttrack", "manifest"},
+        "third_party": False,
+    },
+    "search-tiles": {
+        "blocked_types": {"image", "media", "font", "texttrack", "manifest"},
+        "third_party": False,
+    },
+    "full": {
+        "blocked_types": set(),
+        "third_party": True,
+    },
+}
+
+
+def is_first_party(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in FIRST_PARTY_HOSTS)
+
+
+class ResourceBlocker:
+    """
+    Фильтр запросов страницы + счётчики трафика.
+
+    Заблокированные запросы не скачиваются, поэтому для них известно только
+    количество; байты разрешённых берём из Content-Length ответа.
+    reset() перед каждым goto - статистика по одной странице.
+    """
+
+    def __init__(self, profile: str = "jsonld-only"):
+        if profile not in PROFILES:
+            raise ValueError(f"Неизвестный профиль: {profile}. Доступны: {list(PROFILES)}")
+        self.profile = profile
+        self.reset()
+
+    def reset(self):
+        self.blocked_requests = 0
+        self.blocked_by_type: Dict[str, int] = {}
+        self.allowed_requests = 0
+        self.allowed_bytes = 0
+
+    def stats(self) -> Dict:
+        return {
+            "profile": self.profile,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": dict(self.blocked_by_type),
+            "allowed_requests": self.allowed_requests,
+            "allowed_bytes": self.allowed_bytes,
+        }
+
+    def summary(self) -> str:
+        """Короткая строка для лога"""
+        return (f"{self.profile}: blocked {self.blocked_requests}, "
+                f"allowed {self.allowed_requests} ({self.allowed_bytes / 1024:.0f} KB)")
+
+    async def attach(self, page):
+        """Подключить фильтр к странице (один раз)"""
+        await page.route("**/*", self._handle_route)
+        page.on("response", self._on_response)
+
+    def block_reason(self, resource_type: str, url: str) -> Optional[str]:
+        rules = PROFILES[self.profile]
+        if resource_type in rules["blocked_types"]:
+            return resource_type
+        if not rules["third_party"] and not is_first_party(url):
+            return "third_party"
+        return None
+
+    async def _handle_route(self, route):
+        request = route.request
+        reason = self.block_reason(request.resource_type, request.url)
+
+        if reason:
+            self.blocked_requests += 1
+            self.blocked_by_type[reason] = self.blocked_by_type.get(reason, 0) + 1
+            await route.abort()
+        else:
+            self.allowed_requests += 1
+            await route.continue_()
+
+    def _on_response(self, response):
+        try:
+            self.allowed_bytes += int(response.headers.get("content-length", 0))
+        except (TypeError, ValueError):
+            pass
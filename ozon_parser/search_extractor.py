@@ -0,0 +1,153 @@
+"""
+Извлечение товаров со страницы поиска Ozon за один page.evaluate
+
+Раньше parse_search_page делал 4 evaluate (JSON state, DOM stats, плитки,
+ItemList JSON-LD) и мог вернуть в Python весь window.__INITIAL_STATE__.
+Теперь всё обходится в браузере, а через CDP идёт только компактный ответ:
+
+  block   - null или тип страницы блокировки
+  items   - [[sku, name, price, source], ...], source: 0=tiles 1=jsonld 2=state
+  counts  - сколько товаров нашёл каждый источник (до фильтра target_skus)
+  stats   - счётчики DOM для отладки
+"""
+
+from typing import Dict, List, Optional
+
+
+SOURCES = ("tiles", "jsonld", "state")
+
+# Максимум узлов при обходе JSON state (защита от огромных объектов)
+MAX_STATE_NODES = 50000
+
+SEARCH_EXTRACT_JS = """
+    ([targets, maxNodes, htmlLimit]) => {
+        const skuFromLink = (href) => {
+            const m = (href || '').match(/\\/product\\/(?:[^\\/?]*-)?(\\d+)\\/?/);
+            return m ? m[1] : '';
+        };
+        const toPrice = (v) => {
+            if (typeof v === 'number') return v;
+            const m = String(v || '').replace(/\\s/g, '').match(/(\\d+)/);
+            return m ? parseInt(m[1], 10) : 0;
+        };
+
+        const items = [];
+        const counts = [0, 0, 0];
+        const seen = new Set();
+        const targetSet = targets ? new Set(targets.map(String)) : null;
+        const add = (sku, name, price, source) => {
+            sku = String(sku || '');
+            if (!sku || !(price > 0)) return;
+            counts[source]++;
+            if (seen.has(sku) || (targetSet && !targetSet.has(sku))) return;
+            seen.add(sku);
+            items.push([sku, String(name || '').trim().slice(0, 150), price, source]);
+        };
+
+        // 1. Плитки выдачи (DOM)
+        const cards = document.querySelectorAll('div[class*="tile"], div[class*="product"], a[href*="/product/"]');
+        for (const card of cards) {
+            const link = card.querySelector('a[href*="/product/"]') || card.closest('a[href*="/product/"]');
+            if (!link) continue;
+            const priceEl = card.querySelector('[class*="price"], [class*="Price"], span[class*="c3"]');
+            const nameEl = card.querySelector('[class*="title"], [class*="name"], span[class*="tsBody"]');
+            add(skuFromLink(link.getAttribute('href')),
+                nameEl ? nameEl.textContent : '',
+                priceEl ? toPrice(priceEl.textContent) : 0, 0);
+        }
+
+        // 2. ItemList JSON-LD
+        const jsonLdScripts = document.querySelectorAll('script[type="application/ld+json"]');
+        for (const script of jsonLdScripts) {
+            try {
+                const data = JSON.parse(script.textContent);
+                if (data['@type'] !== 'ItemList' || !data.itemListElement) continue;
+                for (const el of data.itemListElement) {
+                    const item = el.item;
+                    if (!item || !item.offers) continue;
+                    add(item.sku || skuFromLink(item.url), item.name, parseFloat(item.offers.price) || 0, 1);
+                }
+            } catch (e) {}
+        }
+
+        // 3. JSON state: data-state виджета выдачи и window.__INITIAL_STATE__
+        let stateSource = 'not_found';
+        const roots = [];
+        for (const el of document.querySelectorAll('[id^="state-searchResultsV2"]')) {
+            try { roots.push(JSON.parse(el.getAttribute('data-state'))); stateSource = 'widget_state'; } catch (e) {}
+        }
+        if (window.__INITIAL_STATE__) {
+            roots.push(window.__INITIAL_STATE__);
+            if (stateSource === 'not_found') stateSource = '__INITIAL_STATE__';
+        } else if (window.__NUXT__ && stateSource === 'not_found') {
+            stateSource = '__NUXT__';
+        }
+
+        const stack = roots.slice();
+        let visited = 0;
+        while (stack.length && visited < maxNodes) {
+            const node = stack.pop();
+            visited++;
+            if (!node || typeof node !== 'object') continue;
+            if (!Array.isArray(node)) {
+                const link = node.link || (node.action && node.action.link);
+                const sku = node.sku || (typeof link === 'string' ? skuFromLink(link) : '');
+                const price = node.price !== undefined ? node.price : node.finalPrice;
+                if (sku && price !== undefined && typeof price !== 'object') {
+                    add(sku, node.name || node.title, toPrice(price), 2);
+                }
+            }
+            for (const key in node) {
+                const v = node[key];
+                if (v && typeof v === 'object') stack.push(v);
+            }
+        }
+
+        // Антибот: по заголовку, а на пустой странице - по её тексту
+        const title = document.title || '';
+        let block = /Antibot|Challenge|captcha/i.test(title) ? 'antibot' : null;
+        if (!block && !items.length && !document.querySelector('[data-widget="searchResultsV2"]')) {
+            const text = ((document.body && document.body.innerText) || '').slice(0, 3000).toLowerCase();
+            if (/captcha|капч|robot|робот/.test(text)) block = 'captcha';
+        }
+
+        const html = htmlLimit > 0 ? document.documentElement.outerHTML.slice(0, htmlLimit) : '';
+
+        return {
+            title: title.slice(0, 200),
+            block,
+            items,
+            counts,
+            stateSource,
+            stateNodes: visited,
+            html,
+            stats: {
+                searchResultsV2: document.querySelectorAll('[data-widget="searchResultsV2"]').length,
+                dataIndex: document.querySelectorAll('[data-index]').length,
+                productLinks: document.querySelectorAll('a[href*="/product/"]').length,
+                cards: cards.length,
+                scripts: document.querySelectorAll('script').length,
+                jsonLd: jsonLdScripts.length
+            }
+        };
+    }
+"""
+
+
+async def extract_search(page, target_skus: Optional[List[str]] = None, html_limit: int = 0) -> Dict:
+    """
+    Один evaluate: плитки + JSON-LD + JSON state -> компактный список товаров.
+
+    target_skus фильтруются в браузере; html_limit > 0 - вернуть начало HTML
+    для debug-артефакта (вместо полного page.content()).
+    """
+    data = await page.evaluate(
+        SEARCH_EXTRACT_JS,
+        [list(map(str, target_skus)) if target_skus else None, MAX_STATE_NODES, html_limit]
+    )
+    data["counts"] = dict(zip(SOURCES, data.get("counts", [0, 0, 0])))
+    data["products"] = [
+        {"sku": sku, "name": name, "price": price, "source": SOURCES[src]}
+        for sku, name, price, src in data.pop("items", [])
+    ]
+    return data
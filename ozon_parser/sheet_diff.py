@@ -0,0 +1,91 @@
+"""
+Запись в Google Sheets только изменившихся ячеек
+
+Ежедневный перепарс в основном возвращает те же название, бренд и наличие,
+а write_results переписывал весь блок B2:I{n}. Теперь текущий блок читается
+одним batch_get, сравнивается по ячейкам, и отправляются только изменения:
+соседние изменённые ячейки строки склеиваются в один диапазон, а одинаковые
+диапазоны соседних строк - в прямоугольник.
+"""
+
+from typing import Dict, List, Tuple
+
+
+FIRST_COL = "B"
+
+
+def _col(index: int, first_col: str = FIRST_COL) -> str:
+    return chr(ord(first_col) + index)
+
+
+def _same(old, new) -> bool:
+    """Сравнение значения из таблицы (UNFORMATTED_VALUE) с новым"""
+    if old in (None, "") and new in (None, ""):
+        return True
+    numeric = (int, float)
+    if isinstance(old, numeric) and isinstance(new, numeric) and not isinstance(new, bool):
+        return float(old) == float(new)
+    return str(old) == str(new)
+
+
+def diff_updates(current: List[List], rows: List[List], start_row: int = 2,
+                 first_col: str = FIRST_COL) -> List[Dict]:
+    """
+    Диапазоны для worksheet.batch_update: только ячейки, которые отличаются.
+
+    current - то, что сейчас в таблице (строки могут быть короче или
+    отсутствовать - Sheets обрезает пустые хвосты), rows - новые значения.
+    """
+    # 1. Изменённые ячейки каждой строки -> отрезки (первая, последняя колонка)
+    runs: List[Tuple[int, int, int]] = []  # (индекс строки, c1, c2)
+    for i, new_row in enumerate(rows):
+        old_row = current[i] if i < len(current) else []
+        start = None
+        for j, value in enumerate(new_row + [None]):
+            changed = j < len(new_row) and not _same(old_row[j] if j < len(old_row) else "", value)
+            if changed and start is None:
+                start = j
+            elif not changed and start is not None:
+                runs.append((i, start, j - 1))
+                start = None
+
+    # 2. Одинаковые отрезки в соседних строках -> один прямоугольник
+    by_span: Dict[Tuple[int, int], List[int]] = {}
+    for i, c1, c2 in runs:
+        by_span.setdefault((c1, c2), []).append(i)
+
+    updates = []
+    for (c1, c2), row_indexes in by_span.items():
+        first = last = row_indexes[0]
+        for i in row_indexes[1:] + [None]:
+            if i is not None and i == last + 1:
+                last = i
+                continue
+            updates.append({
+                "range": f"{_col(c1, first_col)}{start_row + first}:{_col(c2, first_col)}{start_row + last}",
+                "values": [rows[r][c1:c2 + 1] for r in range(first, last + 1)]
+            })
+            if i is not None:
+                first = last = i
+
+    return updates
+
+
+def write_diff(worksheet, rows: List[List], start_row: int = 2, first_col: str = FIRST_COL) -> Tuple[int, int]:
+    """
+    Читает текущий блок одним batch_get и записывает только изменения.
+    Возвращает (изменённых ячеек, всего ячеек).
+    """
+    if not rows:
+        return 0, 0
+
+    width = max(len(r) for r in rows)
+    block = f"{first_col}{start_row}:{_col(width - 1, first_col)}{start_row + len(rows) - 1}"
+    current = worksheet.batch_get([block], value_render_option="UNFORMATTED_VALUE")[0]
+
+    updates = diff_updates(list(current), rows, start_row, first_col)
+    if updates:
+        worksheet.batch_update(updates, raw=True)
+
+    changed = sum(len(u["values"]) * len(u["values"][0]) for u in updates)
+    return changed, sum(len(r) for r in rows)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Модули ozon_parser импортируются плоско, как при запуске из его папки
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
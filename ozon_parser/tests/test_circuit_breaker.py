@@ -0,0 +1,34 @@
+import pytest
+
+# Модуль импортирует playwright и supabase на верхнем уровне
+pytest.importorskip("playwright")
+pytest.importorskip("supabase")
+
+from github_actions_parser import CloudOzonParser
+from circuit_breaker import CLOSED, OPEN
+
+
+def feed(outcomes):
+    breaker = CloudOzonParser(use_camoufox=False).breaker
+    for blocked in outcomes:
+        breaker.record(blocked)
+    return breaker.state
+
+
+@pytest.mark.parametrize("outcomes", [
+    [True, False],
+    [False, True],
+    [True, False, False],
+    [True, False, False, False, True, False, False, False, True],
+])
+def test_single_blocks_keep_breaker_closed(outcomes):
+    assert feed(outcomes) == CLOSED
+
+
+@pytest.mark.parametrize("outcomes", [
+    [True, True, False],
+    [True, False, True],
+    [False, False, False, True, True, True],
+])
+def test_two_blocks_in_window_open_breaker(outcomes):
+    assert feed(outcomes) == OPEN
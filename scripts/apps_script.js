@@ -69,8 +69,9 @@ function parseOzon() {
     const result = JSON.parse(response.getContentText());
 
     if (result.task_id) {
+      // Повторный клик по той же таблице возвращает уже идущую задачу
       ui.alert(
-        "Парсинг запущен!",
+        result.status === "started" ? "Парсинг запущен!" : "Парсинг уже идёт",
         `Task ID: ${result.task_id}\n\nРезультаты будут записываться в таблицу по мере парсинга.\n\nОжидаемое время: ~${Math.ceil(skuCount * 3 / 60)} мин`,
         ui.ButtonSet.OK
       );